@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import time
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class AnalysisCache:
+    def __init__(self, collection=None, prompt_version="", max_entries=CACHE_MAX_ENTRIES,
+                 ttl_seconds=CACHE_TTL_SECONDS):
+        """
+        Content-addressed cache for image analysis results
+        :param collection: Optional Motor collection used as the persistent store
+        :param prompt_version: Version of the analysis prompt, part of every key
+        :param max_entries: Size of the in-process LRU
+        :param ttl_seconds: Lifetime of a cached analysis
+        """
+        self.collection = collection
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _digest(self, image: Image.Image) -> str:
+        normalized = image if image.mode == "RGB" else image.convert("RGB")
+        hasher = hashlib.sha256()
+        hasher.update(f"{normalized.size[0]}x{normalized.size[1]}".encode())
+        hasher.update(normalized.tobytes())
+        return hasher.hexdigest()
+
+    async def key_for(self, image: Image.Image = None, content_hash: str = None) -> str:
+        """Build the cache key from the normalized image bytes and the prompt version"""
+        if content_hash is None:
+            content_hash = await asyncio.to_thread(self._digest, image)
+        return f"{self.prompt_version}:{content_hash}"
+
+    async def get(self, key: str):
+        """Return the cached analysis for a key, or None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, analysis = entry
+            if expires_at > time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(analysis)
+            del self._entries[key]
+
+        if self.collection is not None:
+            try:
+                document = await self.collection.find_one({
+                    "_id": key,
+                    "prompt_version": self.prompt_version,
+                    "expires_at": {"$gt": datetime.utcnow()}
+                })
+                if document:
+                    analysis = document["analysis"]
+                    remaining = (document["expires_at"] - datetime.utcnow()).total_seconds()
+                    self._remember(key, analysis, time() + remaining)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return dict(analysis)
+            except Exception as e:
+                logger.error(f"Error reading analysis cache: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, analysis: dict):
+        """Store an analysis in the LRU and the persistent store"""
+        self._remember(key, analysis, time() + self.ttl_seconds)
+
+        if self.collection is not None:
+            try:
+                now = datetime.utcnow()
+                await self.collection.replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "prompt_version": self.prompt_version,
+                        "analysis": analysis,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Error writing analysis cache: {e}")
+
+    def _remember(self, key, analysis, expires_at):
+        self._entries[key] = (expires_at, dict(analysis))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, all_versions: bool = False):
+        """Drop cached analyses produced by other prompt versions, or everything"""
+        self._entries.clear()
+        if self.collection is None:
+            return 0
+        query = {} if all_versions else {"prompt_version": {"$ne": self.prompt_version}}
+        result = await self.collection.delete_many(query)
+        logger.info(f"Invalidated {result.deleted_count} cached analyses")
+        return result.deleted_count
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "prompt_version": self.prompt_version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
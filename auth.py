@@ -0,0 +1,150 @@
+import jwt
+import json
+import logging
+import os
+from collections import OrderedDict
+from time import time
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+ALGORITHM = "HS256"
+DEFAULT_KEY_ID = "default"
+# JSON file of the form {"active": "<kid>", "keys": {"<kid>": "<secret>", ...}}
+SECRETS_FILE = os.getenv("JWT_SECRETS_FILE")
+KEY_RELOAD_SECONDS = 30
+TOKEN_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+
+
+class KeyRing:
+    def __init__(self, secrets_file=SECRETS_FILE):
+        """
+        Active JWT signing secrets, reloaded from disk when the file changes
+        :param secrets_file: Optional JSON file holding the active key and all accepted keys
+        """
+        self.secrets_file = secrets_file
+        self.active_kid = DEFAULT_KEY_ID
+        self.keys = {DEFAULT_KEY_ID: os.getenv("JWT_SECRET_KEY", "your_secret_key_here")}
+        self.version = 0
+        self._mtime = None
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Reload the secrets file if it changed; cheap to call on every request"""
+        if not self.secrets_file:
+            return
+        now = time()
+        if not force and now - self._checked_at < KEY_RELOAD_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.secrets_file)
+            if mtime == self._mtime:
+                return
+            with open(self.secrets_file, encoding="utf-8") as f:
+                config = json.load(f)
+            keys = config["keys"]
+            if config["active"] not in keys:
+                raise ValueError("active key id is not listed in keys")
+            self.keys = keys
+            self.active_kid = config["active"]
+            self._mtime = mtime
+            self.version += 1
+            logger.info(f"Loaded {len(keys)} JWT keys, active key: {self.active_kid}")
+        except Exception as e:
+            logger.error(f"Failed to load JWT secrets file: {e}")
+
+    def signing_key(self):
+        return self.active_kid, self.keys[self.active_kid]
+
+
+class TokenVerifier:
+    def __init__(self, keyring: KeyRing, cache_size=TOKEN_CACHE_SIZE):
+        """
+        Verifies bearer tokens, remembering verified ones until they expire
+        :param keyring: Source of accepted secrets
+        :param cache_size: Number of verified tokens kept in the LRU
+        """
+        self.keyring = keyring
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_version = keyring.version
+        self.hits = 0
+        self.misses = 0
+
+    def create_token(self, payload: dict) -> str:
+        kid, secret = self.keyring.signing_key()
+        return jwt.encode(payload, secret, algorithm=ALGORITHM, headers={"kid": kid})
+
+    def verify(self, token: str) -> dict:
+        """Return the token's claims or raise HTTPException(401)"""
+        self.keyring.refresh()
+        if self._cache_version != self.keyring.version:
+            # A key may have been retired, so earlier verifications no longer hold
+            self._cache.clear()
+            self._cache_version = self.keyring.version
+
+        # Keyed on the whole token: the signature only vouches for this exact header and payload
+        cached = self._cache.get(token)
+        if cached is not None:
+            expires_at, claims = cached
+            if expires_at > time():
+                self._cache.move_to_end(token)
+                self.hits += 1
+                return claims
+            del self._cache[token]
+            raise HTTPException(status_code=401, detail="Token has expired")
+
+        self.misses += 1
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        secrets = [self.keyring.keys[kid]] if kid in self.keyring.keys else list(self.keyring.keys.values())
+        for secret in secrets:
+            try:
+                claims = jwt.decode(token, secret, algorithms=[ALGORITHM],
+                                    options={"require": ["exp", "sub"]})
+            except jwt.ExpiredSignatureError:
+                raise HTTPException(status_code=401, detail="Token has expired")
+            except jwt.InvalidTokenError:
+                continue
+            self._remember(token, claims)
+            return claims
+
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    def _remember(self, token, claims):
+        self._cache[token] = (claims["exp"], claims)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self):
+        return {
+            "cached_tokens": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "active_key": self.keyring.active_kid,
+            "keys": len(self.keyring.keys),
+        }
+
+
+token_verifier = TokenVerifier(KeyRing())
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> str:
+    """FastAPI dependency returning the username of a valid bearer token"""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    claims = token_verifier.verify(credentials.credentials)
+    return claims["sub"]
@@ -1,6 +1,8 @@
+import asyncio
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
+from search_index import SearchIndex
 
 logger = logging.getLogger(__name__)
 
@@ -8,6 +10,21 @@ class ContentProcessor:
     def __init__(self, db, image_processor):
         self.db = db
         self.image_processor = image_processor
+        self.search_index = SearchIndex(
+            db.product_references,
+            ["brand_options", "category", "subcategory", "keywords"]
+        )
+        self._search_refresh = None
+
+    def _start_search_refresh(self):
+        """Rebuild the reference index periodically, like the main search indexes"""
+        if self._search_refresh is None or self._search_refresh.done():
+            self._search_refresh = asyncio.create_task(self.search_index.run())
+
+    def close(self):
+        if self._search_refresh is not None:
+            self._search_refresh.cancel()
+            self._search_refresh = None
     
     async def process_content(self, analysis: Dict, caption: Optional[str] = None) -> Dict:
         """Process analyzed content and generate listing"""
@@ -70,16 +87,8 @@ class ContentProcessor:
     async def search_products(self, title: str) -> List[Dict]:
         """Search for products by title"""
         try:
-            cursor = self.db.product_references.find({
-                "$or": [
-                    {"brand_options": {"$regex": title, "$options": "i"}},
-                    {"category": {"$regex": title, "$options": "i"}},
-                    {"subcategory": {"$regex": title, "$options": "i"}},
-                    {"keywords": {"$regex": title, "$options": "i"}}
-                ]
-            }).limit(10)
-            
-            return await cursor.to_list(length=10)
+            self._start_search_refresh()
+            return await self.search_index.find(title, limit=10)
             
         except Exception as e:
             logger.error(f"Error searching products: {e}")
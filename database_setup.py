@@ -83,6 +83,8 @@ def setup_product_database():
         video_collection = db["videos"]
         video_listings_collection = db["video_listings"]
         video_analytics_collection = db["video_analytics"]
+        analysis_cache_collection = db["analysis_cache"]
+        video_jobs_collection = db["video_jobs"]
 
         # Delete indexes
         product_collection.drop_indexes()
@@ -92,6 +94,8 @@ def setup_product_database():
         video_collection.drop_indexes()
         video_listings_collection.drop_indexes()
         video_analytics_collection.drop_indexes()
+        analysis_cache_collection.drop_indexes()
+        video_jobs_collection.drop_indexes()
         
         # Create indexes for products
         product_collection.create_index([("id", ASCENDING)])
@@ -187,6 +191,13 @@ def setup_product_database():
         video_analytics_collection.create_index([("performance.retention_rate", ASCENDING)])  
         video_analytics_collection.create_index([("performance.click_through_rate", ASCENDING)])
 
+        # Create indexes for the image analysis cache
+        analysis_cache_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        analysis_cache_collection.create_index([("prompt_version", ASCENDING)])
+
+        # Create indexes for video processing jobs
+        video_jobs_collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+
         logger.info("All indexes created successfully")
 
         # Clear Existing Products
@@ -0,0 +1,96 @@
+import logging
+import os
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Smallest frame height worth fetching; frames are downscaled for analysis anyway
+TARGET_HEIGHT = int(os.getenv("VIDEO_TARGET_HEIGHT", "480"))
+# Only the first N seconds are fetched and analyzed; 0 fetches the whole video
+MAX_SECONDS = float(os.getenv("VIDEO_MAX_SECONDS", "0"))
+# Identifies what plan_fetch downloads with these settings; cached downloads are keyed by it
+PLAN_VARIANT = f"{TARGET_HEIGHT}p-{MAX_SECONDS:g}s"
+
+
+def _has_video(fmt):
+    return fmt.get("vcodec") not in (None, "none") and bool(fmt.get("height"))
+
+
+def _has_audio(fmt):
+    return fmt.get("acodec") not in (None, "none")
+
+
+def _bitrate(fmt):
+    return fmt.get("tbr") or fmt.get("vbr") or fmt.get("abr") or float("inf")
+
+
+def _size(fmt):
+    return fmt.get("filesize") or fmt.get("filesize_approx") or float("inf")
+
+
+def _smallest_meeting(formats, target_height):
+    """Lowest format at or above target_height, else the tallest one below it"""
+    if not formats:
+        return None
+    tall_enough = [f for f in formats if f["height"] >= target_height]
+    if tall_enough:
+        return min(tall_enough, key=lambda f: (f["height"], _bitrate(f), _size(f)))
+    return max(formats, key=lambda f: (f["height"], -_bitrate(f)))
+
+
+def choose_formats(formats, target_height=TARGET_HEIGHT, can_merge=True):
+    """
+    Pick what to fetch from a yt-dlp format list
+    :param can_merge: Whether ffmpeg is available to mux separate video and audio streams
+    :return: (video format, audio format or None); the video format carries audio when the second is None
+    """
+    video_only = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    combined = [f for f in formats if _has_video(f) and _has_audio(f)]
+
+    if can_merge and video_only and audio_only:
+        video = _smallest_meeting(video_only, target_height)
+        audio = min(audio_only, key=lambda f: (f.get("abr") or _bitrate(f), _size(f)))
+        # Keep a separate pair only if it is not taller than the best combined alternative
+        best_combined = _smallest_meeting(combined, target_height)
+        if best_combined is None or video["height"] <= best_combined["height"]:
+            return video, audio
+    return _smallest_meeting(combined, target_height), None
+
+
+def plan_fetch(info, target_height=TARGET_HEIGHT, max_seconds=MAX_SECONDS, ffmpeg_path=None):
+    """
+    Turn a yt-dlp info dict into download options for the smallest useful fetch
+    :param info: Result of YoutubeDL.extract_info(url, download=False)
+    :param ffmpeg_path: ffmpeg binary; merging streams and partial downloads need it
+    :return: Dict of YoutubeDL options, or {"format": "best"} if nothing suitable was found
+    """
+    video, audio = choose_formats(info.get("formats") or [], target_height, can_merge=bool(ffmpeg_path))
+    if video is None:
+        return {"format": "best"}
+
+    options = {"format": video["format_id"] + (f"+{audio['format_id']}" if audio else "")}
+    if ffmpeg_path:
+        options["ffmpeg_location"] = ffmpeg_path
+    if audio:
+        options["merge_output_format"] = "mp4"
+
+    duration = info.get("duration")
+    if max_seconds and ffmpeg_path and (not duration or duration > max_seconds):
+        from yt_dlp.utils import download_range_func
+        options["download_ranges"] = download_range_func(None, [(0, max_seconds)])
+
+    logger.info(f"Fetch plan for {info.get('id')}: format {options['format']} at {video.get('height')}p"
+                + (f", first {max_seconds}s only" if "download_ranges" in options else ""))
+    return options
+
+
+def stream_urls(info, target_height=TARGET_HEIGHT):
+    """Direct (video URL, audio URL) for decoding without a download; the audio URL may equal the video URL"""
+    video, audio = choose_formats(info.get("formats") or [], target_height)
+    if video is None:
+        url = info.get("url")
+        return url, url
+    return video.get("url"), (audio or video).get("url")
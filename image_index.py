@@ -0,0 +1,134 @@
+import logging
+import os
+from collections import OrderedDict
+from itertools import combinations
+from PIL import Image
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+HASH_BITS = 64
+# Maximum Hamming distance between two dHashes of the same product shot
+MAX_DISTANCE = 6
+# Number of sub-hash tables used for multi-index hashing
+CHUNKS = 4
+# Hashes kept before the least recently used ones are dropped. Each hash costs roughly
+# 0.5KB with its entry, so the default holds about 0.5GB plus the shared payloads
+MAX_ENTRIES = int(os.getenv("IMAGE_INDEX_MAX_ENTRIES", "1000000"))
+
+
+def dhash(image: Image.Image) -> int:
+    """Compute a 64-bit difference hash of an image"""
+    grayscale = image.convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = grayscale.tobytes()
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance=MAX_DISTANCE, chunks=CHUNKS, max_entries=MAX_ENTRIES):
+        """
+        Perceptual-hash index with Hamming-distance lookup (multi-index hashing)
+
+        Each hash is split into `chunks` sub-hashes. If two hashes are within
+        `max_distance`, at least one sub-hash differs by at most
+        `max_distance // chunks` bits, so a lookup only probes those
+        neighbours in each table and verifies the candidates it finds.
+        :param max_distance: Largest Hamming distance treated as a duplicate
+        :param chunks: Number of sub-hash tables
+        :param max_entries: Hashes kept before least recently used ones are evicted
+        """
+        if HASH_BITS % chunks:
+            raise ValueError("chunks must divide the hash size")
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.evictions = 0
+        self._probes = self._build_probes(max_distance // chunks)
+
+    def _build_probes(self, radius):
+        probes = [0]
+        for flipped in range(1, radius + 1):
+            for bits in combinations(range(self.chunk_bits), flipped):
+                mask = 0
+                for bit in bits:
+                    mask |= 1 << bit
+                probes.append(mask)
+        return probes
+
+    def _split(self, image_hash):
+        return [(image_hash >> (i * self.chunk_bits)) & self._chunk_mask
+                for i in range(self.chunks)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, image_hash: int, **payload):
+        """Register a hash, merging the payload into any existing entry"""
+        entry = self._entries.get(image_hash)
+        if entry is not None:
+            entry.update(payload)
+            self._entries.move_to_end(image_hash)
+            return
+        self._entries[image_hash] = dict(payload)
+        for table, chunk in zip(self._tables, self._split(image_hash)):
+            # Buckets are dicts used as ordered sets, so eviction removes a hash in O(1)
+            table.setdefault(chunk, {})[image_hash] = None
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, image_hash):
+        del self._entries[image_hash]
+        for table, chunk in zip(self._tables, self._split(image_hash)):
+            bucket = table[chunk]
+            del bucket[image_hash]
+            if not bucket:
+                del table[chunk]
+
+    def lookup(self, image_hash: int):
+        """Return (payload, distance) of the closest indexed hash, or None"""
+        entry = self._entries.get(image_hash)
+        if entry is not None:
+            self._entries.move_to_end(image_hash)
+            return entry, 0
+
+        best_hash, best_distance = None, self.max_distance + 1
+        for table, chunk in zip(self._tables, self._split(image_hash)):
+            for probe in self._probes:
+                bucket = table.get(chunk ^ probe)
+                if not bucket:
+                    continue
+                for candidate in bucket:
+                    distance = (candidate ^ image_hash).bit_count()
+                    if distance < best_distance:
+                        best_hash, best_distance = candidate, distance
+
+        if best_hash is None:
+            return None
+        self._entries.move_to_end(best_hash)
+        return self._entries[best_hash], best_distance
+
+    def stats(self):
+        return {
+            "hashes": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "max_distance": self.max_distance,
+            "chunks": self.chunks,
+            "probes_per_lookup": len(self._probes) * self.chunks,
+        }
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF decoder on Pillow builds without it
+except ImportError:  # Pillow 11.2+ decodes AVIF natively
+    pillow_avif = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Longest side sent to the model; larger photos cost bandwidth without adding detail
+MODEL_MAX_SIDE = int(os.getenv("IMAGE_MODEL_MAX_SIDE", "1024"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+INGEST_WORKERS = int(os.getenv("IMAGE_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Background used where transparent images are flattened
+BACKGROUND = (255, 255, 255)
+
+Image.init()
+if ".avif" not in Image.registered_extensions():
+    logger.warning("AVIF uploads cannot be decoded: install pillow-avif-plugin (see requirements.txt)")
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="image-ingest")
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Convert any mode to RGB, flattening transparency onto a white background"""
+    if image.mode == "RGB":
+        return image
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA", "PA"):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, BACKGROUND)
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def normalize_image(source, max_side=MODEL_MAX_SIDE) -> Image.Image:
+    """
+    Decode an upload into an upright RGB image no larger than the model needs
+    :param source: Path or file object
+    :param max_side: Longest side of the result
+    """
+    image = Image.open(source)
+    if image.format == "JPEG":
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full resolution
+        image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image = _to_rgb(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def encode_image(image: Image.Image) -> dict:
+    """Re-encode an RGB image as a compact JPEG blob for the model request"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return {"mime_type": "image/jpeg", "data": buffer.getvalue()}
+
+
+async def ingest_image(source, max_side=MODEL_MAX_SIDE) -> Image.Image:
+    """normalize_image on the ingest thread pool, keeping decoding off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, normalize_image, source, max_side)
+
+
+async def encode_images(images) -> list:
+    """encode_image for several images on the ingest thread pool"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_executor, encode_image, image) for image in images))
@@ -1,29 +1,18 @@
 import google.generativeai as genai
+import asyncio
+import hashlib
 import os
+from collections import Counter
 from dotenv import load_dotenv
 import logging
 from PIL import Image
+from model_client import get_model_client
+from image_ingest import encode_images
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-class ImageProcessor:
-    def __init__(self):
-        load_dotenv()
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            print("WARNING: GOOGLE_API_KEY not found. Using a dummy key.")
-            api_key = "dummy_key"
-
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-pro-latest")
-
-    async def analyze_product(self, image: Image.Image):
-        """Analyze product image and return structured data"""
-        try:
-            analysis_prompt = [
-                """Analyze this product image and provide detailed information in the following format exactly:
+ANALYSIS_PROMPT = """Analyze this product image and provide detailed information in the following format exactly:
 
 BEGIN_ANALYSIS
 Product Name: [exact product name]
@@ -39,14 +28,61 @@ Search Keywords:
 - [keyword 1]
 - [keyword 2]
 - [keyword 3]
-END_ANALYSIS""",
-                image
-            ]
+END_ANALYSIS"""
+
+BATCH_ANALYSIS_PROMPT = ("All of the following images show the same product from different angles. "
+                         "Use every image together and describe the product once.\n\n"
+                         + ANALYSIS_PROMPT.replace("this product image", "these product images"))
+
+# Changes whenever a prompt changes, so cached analyses are invalidated
+PROMPT_VERSION = hashlib.sha256((ANALYSIS_PROMPT + BATCH_ANALYSIS_PROMPT).encode()).hexdigest()[:12]
+
+# Multi-image analysis: "single" packs every photo into one request, "concurrent" analyzes them separately
+BATCH_MODE = os.getenv("ANALYSIS_BATCH_MODE", "single")
+MAX_IMAGES_PER_REQUEST = int(os.getenv("ANALYSIS_MAX_IMAGES_PER_REQUEST", "5"))
+MAX_CONCURRENT_ANALYSES = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "3"))
+
+
+class ImageProcessor:
+    def __init__(self, cache=None):
+        load_dotenv()
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            print("WARNING: GOOGLE_API_KEY not found. Using a dummy key.")
+            api_key = "dummy_key"
 
-            response = self.model.generate_content(analysis_prompt)
+        genai.configure(api_key=api_key)
+        self.model = get_model_client("gemini-1.5-pro-latest")
+        self.cache = cache
+
+    async def _cache_key(self, image, content_hash=None):
+        # Uploads hashed while streaming skip re-hashing the decoded pixels
+        if content_hash:
+            return await self.cache.key_for(content_hash=f"upload-{content_hash}")
+        return await self.cache.key_for(image)
+
+    async def analyze_product(self, image: Image.Image, content_hash: str = None):
+        """
+        Analyze product image and return structured data
+        :param content_hash: sha256 of the uploaded file, if already known
+        """
+        try:
+            cache_key = None
+            if self.cache is not None:
+                cache_key = await self._cache_key(image, content_hash)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            # Send a compact JPEG rather than letting the SDK re-encode the image losslessly
+            image_parts = await encode_images([image])
+            response = await self.model.generate_content([ANALYSIS_PROMPT, *image_parts])
             analysis_dict = self._parse_analysis(response.text)
             analysis_dict['status'] = 'success'
 
+            if cache_key is not None:
+                await self.cache.set(cache_key, analysis_dict)
+
             return analysis_dict
 
         except Exception as e:
@@ -56,6 +92,77 @@ END_ANALYSIS""",
                 'message': str(e)
             }
 
+    async def analyze_products(self, images, content_hashes=None):
+        """
+        Analyze several photos of the same product and return one merged analysis
+        :param content_hashes: sha256 of each uploaded file, if already known
+        """
+        content_hashes = content_hashes or [None] * len(images)
+        if len(images) == 1:
+            return await self.analyze_product(images[0], content_hashes[0])
+
+        try:
+            cache_key = None
+            if self.cache is not None:
+                image_keys = await asyncio.gather(*(self._cache_key(image, content_hash)
+                                                    for image, content_hash in zip(images, content_hashes)))
+                batch_hash = hashlib.sha256("|".join(sorted(image_keys)).encode()).hexdigest()
+                cache_key = await self.cache.key_for(content_hash=f"batch-{batch_hash}")
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            if BATCH_MODE == "single" and len(images) <= MAX_IMAGES_PER_REQUEST:
+                # One multimodal request covering every photo
+                image_parts = await encode_images(images)
+                response = await self.model.generate_content([BATCH_ANALYSIS_PROMPT, *image_parts])
+                analysis_dict = self._parse_analysis(response.text)
+            else:
+                slots = asyncio.Semaphore(MAX_CONCURRENT_ANALYSES)
+
+                async def analyze(image, content_hash):
+                    async with slots:
+                        return await self.analyze_product(image, content_hash)
+
+                results = await asyncio.gather(*(analyze(image, content_hash)
+                                                 for image, content_hash in zip(images, content_hashes)))
+                successes = [r for r in results if r.get('status') == 'success']
+                if not successes:
+                    return results[0]
+                analysis_dict = self._merge_analyses(successes)
+
+            analysis_dict['status'] = 'success'
+            analysis_dict['images_analyzed'] = len(images)
+
+            if cache_key is not None:
+                await self.cache.set(cache_key, analysis_dict)
+
+            return analysis_dict
+
+        except Exception as e:
+            logger.error(f"Error in analyze_products: {str(e)}")
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+
+    def _merge_analyses(self, analyses):
+        """Combine per-image analyses: the most common value per field, the union of list fields"""
+        merged = {}
+        for field in ('product_name', 'category', 'subcategory', 'description', 'price'):
+            values = [a.get(field, '') for a in analyses if a.get(field)]
+            # most_common keeps first-seen order on ties
+            merged[field] = Counter(values).most_common(1)[0][0] if values else ''
+
+        for field in ('key_features', 'search_keywords'):
+            seen = {}
+            for analysis in analyses:
+                for item in analysis.get(field, []):
+                    seen.setdefault(item.lower(), item)
+            merged[field] = list(seen.values())
+
+        return merged
+
     def _parse_analysis(self, text):
         """Parse the analysis text into structured format"""
         analysis_dict = {
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Number of processes running video jobs at once
+JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))
+# How often event streams re-read a job that may be running in another API process
+EVENT_POLL_SECONDS = float(os.getenv("VIDEO_JOB_EVENT_POLL_SECONDS", "2"))
+# Jobs whose API process has not refreshed them for STALE_JOB_SECONDS are re-queued
+HEARTBEAT_SECONDS = int(os.getenv("VIDEO_JOB_HEARTBEAT_SECONDS", "30"))
+STALE_JOB_SECONDS = int(os.getenv("VIDEO_JOB_STALE_SECONDS", str(4 * HEARTBEAT_SECONDS)))
+# Largest video accepted as an upload
+MAX_UPLOAD_BYTES = int(os.getenv("VIDEO_UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_DIR = Path("temp/uploads")
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+# Per worker process: one event loop, one VideoProcessor and one Mongo client, reused by every job.
+# The processor's rate limiter and the shared Gemini semaphore bind to the loop they first wait on,
+# so jobs must not each get a fresh loop from asyncio.run().
+_worker_loop = None
+_worker_processor = None
+_worker_jobs = None
+
+
+def _mark_job_running(job_store, job_id):
+    """Record that the job has left the queue; runs in the worker, so it reports real start time"""
+    global _worker_jobs
+    if job_store is None:
+        return
+    if _worker_jobs is None:
+        from pymongo import MongoClient
+        database, collection = job_store
+        _worker_jobs = MongoClient(os.getenv("MONGODB_URL"))[database][collection]
+    now = datetime.utcnow().isoformat()
+    _worker_jobs.update_one({"_id": job_id}, {"$set": {"status": "running", "started_at": now, "updated_at": now}})
+
+
+def _run_video_job(job_store, job_id, kind, source):
+    """Entry point in the worker process: run the whole video pipeline for one job"""
+    global _worker_loop, _worker_processor
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    if _worker_processor is None:
+        from video_processor import VideoProcessor
+        _worker_processor = VideoProcessor(os.getenv("GOOGLE_API_KEY"))
+
+    try:
+        _mark_job_running(job_store, job_id)
+    except Exception as e:
+        logger.warning(f"Could not mark video job {job_id} running: {e}")
+
+    if kind == "upload":
+        return _worker_loop.run_until_complete(_worker_processor.process_local_video(Path(source)))
+    return _worker_loop.run_until_complete(_worker_processor.process_video(source))
+
+
+class VideoJobQueue:
+    def __init__(self, collection, max_workers=JOB_WORKERS):
+        """
+        Runs video processing jobs in a process pool and persists their state to Mongo
+        :param collection: Motor collection holding one document per job
+        :param max_workers: Number of worker processes
+        """
+        self.collection = collection
+        self.max_workers = max_workers
+        self._executor = None
+        self._tasks = {}
+        self._subscribers = {}
+        self.recovered = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawned workers do not inherit the server's threads, sockets or event loop
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _job_store(self):
+        """(database, collection) names the worker processes use to report progress"""
+        database = getattr(self.collection, "database", None)
+        return (database.name, self.collection.name) if database is not None else None
+
+    def _start(self, job_id, kind, source):
+        task = asyncio.create_task(self._run(job_id, kind, source))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def submit(self, kind, source):
+        """
+        Record a job and start it in the background
+        :param kind: "url" for a video link, "upload" for a file saved on disk
+        :param source: The URL or the saved file path
+        :return: The job id
+        """
+        now = datetime.utcnow().isoformat()
+        job_id = uuid.uuid4().hex
+        await self.collection.insert_one({
+            "_id": job_id,
+            "kind": kind,
+            "source": source,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "heartbeat_at": now,
+        })
+
+        self._start(job_id, kind, source)
+        logger.info(f"Queued video job {job_id} ({kind})")
+        return job_id
+
+    async def _run(self, job_id, kind, source):
+        # The worker marks the job "running" when it actually starts; until then it stays "queued"
+        executor = self._get_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, _run_video_job,
+                                                self._job_store(), job_id, kind, source)
+            if result.get("status") == "success":
+                await self._update(job_id, status="completed", result=result)
+            else:
+                await self._update(job_id, status="failed", error=result.get("message"))
+        except asyncio.CancelledError:
+            raise
+        except BrokenProcessPool as e:
+            # A worker died (OOM kill, native crash); the pool is unusable, so the next job gets a new one
+            logger.error(f"Video job {job_id} failed, a worker process died: {e}")
+            self._discard_executor(executor)
+            await self._update(job_id, status="failed", error="Video worker process died")
+        except Exception as e:
+            logger.error(f"Video job {job_id} failed: {e}")
+            await self._update(job_id, status="failed", error=str(e))
+
+    def _discard_executor(self, executor):
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _update(self, job_id, **fields):
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(fields)
+
+    async def get(self, job_id):
+        return await self.collection.find_one({"_id": job_id})
+
+    async def events(self, job_id):
+        """Yield the job each time its status changes, ending once it completes or fails"""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            while job["status"] not in TERMINAL_STATUSES:
+                try:
+                    job = {**job, **await asyncio.wait_for(queue.get(), timeout=EVENT_POLL_SECONDS)}
+                except asyncio.TimeoutError:
+                    # The job may be running in another API process; check Mongo instead
+                    latest = await self.get(job_id)
+                    if latest is None or latest["status"] == job["status"]:
+                        continue
+                    job = latest
+                yield job
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    async def recover(self):
+        """
+        Re-queue jobs whose owning API process stopped (no heartbeat for STALE_JOB_SECONDS)
+        Each job is claimed with an atomic update, so only one API process restarts it.
+        """
+        cutoff = (datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+        stale = {"status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$lt": cutoff}}
+        async for job in self.collection.find(stale, {"kind": 1, "source": 1}):
+            now = datetime.utcnow().isoformat()
+            claimed = await self.collection.find_one_and_update(
+                {**stale, "_id": job["_id"]},
+                {"$set": {"status": "queued", "heartbeat_at": now, "updated_at": now}}
+            )
+            if claimed is not None:
+                self.recovered += 1
+                logger.warning(f"Re-queuing video job {job['_id']} left unfinished by a stopped process")
+                self._start(job["_id"], job["kind"], job["source"])
+
+    async def run(self):
+        """Keep this process's jobs alive in Mongo and pick up jobs orphaned by other processes"""
+        while True:
+            try:
+                if self._tasks:
+                    await self.collection.update_many(
+                        {"_id": {"$in": list(self._tasks)}},
+                        {"$set": {"heartbeat_at": datetime.utcnow().isoformat()}}
+                    )
+                await self.recover()
+            except PyMongoError as e:
+                logger.error(f"Error maintaining video jobs: {e}")
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "running_in_process": len(self._tasks),
+            "recovered": self.recovered,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+    def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
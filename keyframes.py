@@ -0,0 +1,73 @@
+import logging
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 32
+HISTOGRAM_BINS = 16
+# Frames with less grayscale spread than this are treated as blank (fades, black intros)
+MIN_FRAME_STD = 8.0
+
+
+def frame_signatures(frames):
+    """
+    Compute per-frame colour histograms and grayscale thumbnails in one vectorized pass
+    :return: (histograms of shape (N, 3 * bins), thumbnails of shape (N, size * size))
+    """
+    pixels = np.stack([
+        np.asarray(frame.convert("RGB").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR))
+        for frame in frames
+    ]).astype(np.int64)
+    count = pixels.shape[0]
+
+    # Per-channel histograms for all frames with a single bincount
+    quantized = pixels // (256 // HISTOGRAM_BINS)
+    channel_offsets = np.arange(3) * HISTOGRAM_BINS
+    frame_offsets = np.arange(count)[:, None, None, None] * 3 * HISTOGRAM_BINS
+    flat = (quantized + channel_offsets + frame_offsets).ravel()
+    histograms = np.bincount(flat, minlength=count * 3 * HISTOGRAM_BINS).reshape(count, -1).astype(np.float64)
+    histograms /= histograms.sum(axis=1, keepdims=True)
+
+    grayscale = pixels @ np.array([299, 587, 114]) / 1000.0
+    thumbnails = grayscale.reshape(count, -1)
+    return histograms, thumbnails
+
+
+def pairwise_distances(histograms, thumbnails):
+    """Combine colour-histogram and structural distances between every pair of frames"""
+    histogram_distance = np.abs(histograms[:, None, :] - histograms[None, :, :]).sum(axis=2) / 2
+    structural_distance = np.abs(thumbnails[:, None, :] - thumbnails[None, :, :]).mean(axis=2) / 255.0
+    return histogram_distance + structural_distance
+
+
+def select_keyframes(frames, count):
+    """
+    Pick the `count` most mutually distinct frames, returned in their original order
+    :param frames: Candidate PIL frames in temporal order
+    :param count: Number of keyframes to keep
+    """
+    if len(frames) <= count:
+        return list(frames)
+
+    histograms, thumbnails = frame_signatures(frames)
+    distances = pairwise_distances(histograms, thumbnails)
+
+    usable = thumbnails.std(axis=1) >= MIN_FRAME_STD
+    if usable.sum() < count:
+        usable[:] = True
+
+    # Start from the frame that differs most from all the others (the biggest scene change)
+    totals = np.where(usable, distances.sum(axis=1), -np.inf)
+    selected = [int(np.argmax(totals))]
+
+    # Greedy farthest-point selection over the remaining candidates
+    nearest = distances[selected[0]].copy()
+    while len(selected) < count:
+        scores = np.where(usable, nearest, -np.inf)
+        scores[selected] = -np.inf
+        choice = int(np.argmax(scores))
+        selected.append(choice)
+        nearest = np.minimum(nearest, distances[choice])
+
+    return [frames[i] for i in sorted(selected)]
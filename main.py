@@ -1,25 +1,31 @@
 import google.generativeai as genai
-import jwt
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Request, UploadFile, HTTPException, File, Depends
 from flask import request
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import asyncio
 import logging
 import os
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from PIL import Image
 from dotenv import load_dotenv
 from time import time
-from image_processor import ImageProcessor
-from routers import image, video, combined
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
+from image_processor import ImageProcessor, PROMPT_VERSION
+from analysis_cache import AnalysisCache
+from image_index import NearDuplicateIndex, dhash
+from image_ingest import ingest_image
+from upload_ingest import read_upload_form, multipart_openapi, TOO_MANY_IMAGES
+from recommendation_index import RecommendationIndex, format_recommendation
+from search_index import SearchIndex
+from job_queue import VideoJobQueue
+from model_registry import model_registry, warmup as warmup_models
+from routers import image, video, combined, jobs
 from schemas.user_schema import UserSignup, UserLogin
 from starlette.requests import Request
 from starlette.templating import Jinja2Templates
-from bcrypt import hashpw, gensalt, checkpw
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from auth import token_verifier
 
 # Configure logging
 logging.basicConfig(
@@ -34,12 +40,8 @@ app = FastAPI(
 # Load .env file
 load_dotenv()
 
-# Hash passwords setup
-def hash_password(password: str) -> str:
-    return hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    return checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+# Hash passwords setup (bcrypt runs in a process pool, off the event loop)
+password_hasher = PasswordHasher()
 
 
 # MongoDB setup
@@ -67,27 +69,138 @@ review_collection = db["reviews"]
 video_collection = db["videos"]
 video_listings_collection = db["video_listings"]
 video_analytics_collection = db["video_analytics"]
+# Cache Collections
+analysis_cache_collection = db["analysis_cache"]
+# Job Collections
+video_jobs_collection = db["video_jobs"]
 
 # Static files and templates setup
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Initialize Image Processor
-image_processor = ImageProcessor()
+# Initialize Image Processor with a content-addressed analysis cache
+analysis_cache = AnalysisCache(analysis_cache_collection, prompt_version=PROMPT_VERSION)
+image_processor = ImageProcessor(cache=analysis_cache)
+
+# Perceptual-hash index of uploaded images for near-duplicate reuse
+image_index = NearDuplicateIndex()
+
+# Precomputed recommendations, built at startup and kept fresh in the background
+recommendation_index = RecommendationIndex(product_collection)
+
+# Title search indexes used by the search endpoints
+product_search = SearchIndex(product_collection, ["title"])
+video_search = SearchIndex(video_collection, ["title"])
+
+# Video processing runs in a separate process pool; job state lives in Mongo
+video_jobs = VideoJobQueue(video_jobs_collection)
 
 # Include Routers
 app.include_router(image.router, prefix="/upload/image", tags=["Image"])
 app.include_router(video.router, prefix="/upload/video", tags=["Video"])
 app.include_router(combined.router, prefix="/search/all", tags=["Combined"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
 
-SECRET_KEY = "your_secret_key_here"  # Store in environment variable
-
+# Signing secrets come from JWT_SECRET_KEY or the rotating JWT_SECRETS_FILE (see auth.py)
 def create_jwt(username: str):
     payload = {
         "sub": username,
         "exp": datetime.utcnow() + timedelta(days=1)  # Token expires in 1 day
     }
-    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    return token_verifier.create_token(payload)
+
+
+@app.on_event("startup")
+async def purge_stale_analysis_cache():
+    """
+    Drop cached analyses produced by a previous version of the analysis prompt.
+    """
+    try:
+        await analysis_cache.invalidate()
+    except Exception as e:
+        logger.error(f"Failed to purge stale analysis cache: {e}")
+
+
+@app.on_event("startup")
+async def start_recommendation_index():
+    """
+    Build the recommendation index and start its background refresh.
+    """
+    try:
+        await recommendation_index.build()
+    except Exception as e:
+        logger.error(f"Failed to build recommendation index: {e}")
+    app.state.recommendation_refresh = asyncio.create_task(recommendation_index.run())
+
+
+@app.on_event("shutdown")
+async def stop_recommendation_index():
+    task = getattr(app.state, "recommendation_refresh", None)
+    if task:
+        task.cancel()
+
+
+@app.on_event("startup")
+async def start_search_indexes():
+    """
+    Build the title search indexes and start their background refresh.
+    """
+    app.state.search_refresh = []
+    for search_index in (product_search, video_search):
+        try:
+            await search_index.build()
+        except Exception as e:
+            logger.error(f"Failed to build search index: {e}")
+        app.state.search_refresh.append(asyncio.create_task(search_index.run()))
+
+
+@app.on_event("startup")
+async def preload_models():
+    """
+    Load the models named in PRELOAD_MODELS before serving traffic.
+    """
+    try:
+        await asyncio.to_thread(warmup_models)
+    except Exception as e:
+        logger.error(f"Failed to preload models: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_search_indexes():
+    for task in getattr(app.state, "search_refresh", []):
+        task.cancel()
+
+
+@app.on_event("startup")
+async def start_password_hasher():
+    """
+    Start the password hashing workers before serving logins.
+    """
+    try:
+        await password_hasher.start()
+    except Exception as e:
+        logger.error(f"Failed to start password hashing workers: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+async def start_video_jobs():
+    """
+    Re-queue video jobs orphaned by a stopped process and keep this process's jobs alive.
+    """
+    app.state.video_jobs_refresh = asyncio.create_task(video_jobs.run())
+
+
+@app.on_event("shutdown")
+async def stop_video_jobs():
+    task = getattr(app.state, "video_jobs_refresh", None)
+    if task:
+        task.cancel()
+    video_jobs.shutdown()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -146,6 +259,46 @@ async def pool_stats():
         logger.error(f"Error fetching pool stats: {e}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+@app.get("/cache-stats", tags=["Monitoring"])
+async def cache_stats():
+    """
+    Endpoint to retrieve image analysis cache and near-duplicate index stats.
+    """
+    return JSONResponse(content={"analysis_cache": analysis_cache.stats(),
+                                 "image_index": image_index.stats()},
+                        status_code=200)
+
+@app.get("/recommendation-stats", tags=["Monitoring"])
+async def recommendation_stats():
+    """
+    Endpoint to retrieve recommendation index size, memory use and rebuild time.
+    """
+    return JSONResponse(content={"recommendation_index": recommendation_index.stats()},
+                        status_code=200)
+
+@app.get("/search-stats", tags=["Monitoring"])
+async def search_stats():
+    """
+    Endpoint to retrieve search index sizes and rebuild times.
+    """
+    return JSONResponse(content={"products": product_search.stats(),
+                                 "videos": video_search.stats()},
+                        status_code=200)
+
+@app.get("/model-stats", tags=["Monitoring"])
+async def model_stats():
+    """
+    Endpoint to retrieve model load times and resident memory.
+    """
+    return JSONResponse(content=model_registry.stats(), status_code=200)
+
+@app.get("/job-stats", tags=["Monitoring"])
+async def job_stats():
+    """
+    Endpoint to retrieve video job worker and subscriber counts.
+    """
+    return JSONResponse(content={"video_jobs": video_jobs.stats()}, status_code=200)
+
 @app.get("/signup_page", response_class=HTMLResponse)
 async def render_signup_page(request: Request):
     return templates.TemplateResponse("signup.html", {"request": request})
@@ -163,21 +316,37 @@ async def dashboard(request: Request):
 
 
 
-@app.post("/upload_image")
-async def upload_image(request: Request, file: UploadFile):
+@app.post("/upload_image", openapi_extra=multipart_openapi("file"))
+async def upload_image(request: Request):
     """
     Handle image upload, analyze the product, and generate personalized recommendations.
     """
+    # Stream the body with size limits; oversized uploads are rejected before being read in full
+    _, files = await read_upload_form(request, file_fields=("file",), max_files=1,
+                                   too_many_files=TOO_MANY_IMAGES)
+    if not files:
+        raise HTTPException(status_code=422, detail="Form field 'file' is required")
+    file = files[0]
+
     try:
-        # Open the uploaded image
-        image = Image.open(file.file)
+        # Decode, orient and downscale the upload off the event loop
+        image = await ingest_image(file.file)
+
+        # Reuse the analysis of a near-duplicate upload if there is one
+        image_hash = await asyncio.to_thread(dhash, image)
+        match = image_index.lookup(image_hash)
+        if match and "analysis" in match[0]:
+            logger.info(f"Near-duplicate image found (distance {match[1]}), reusing analysis")
+            raw_response = dict(match[0]["analysis"])
+        else:
+            # Analyze the image using ImageProcessor
+            raw_response = await image_processor.analyze_product(image, content_hash=file.content_hash)
 
-        # Analyze the image using ImageProcessor
-        raw_response = await image_processor.analyze_product(image)
+            if raw_response.get("status") == "error":
+                raise HTTPException(status_code=500,
+                                    detail=raw_response.get("message"))
 
-        if raw_response.get("status") == "error":
-            raise HTTPException(status_code=500,
-                                detail=raw_response.get("message"))
+            image_index.add(image_hash, analysis=raw_response)
 
         # Generate dynamic recommendations
         recommendations = await generate_recommendations(raw_response)
@@ -194,12 +363,16 @@ async def upload_image(request: Request, file: UploadFile):
                 "result.html",
                 {"request": request, "result": result}
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         return JSONResponse(
             content={"status": "error", "message": "Failed to process image"},
             status_code=500
         )
+    finally:
+        await file.close()
 
 @app.post("/signup")
 async def signup(user: UserSignup):
@@ -209,7 +382,10 @@ async def signup(user: UserSignup):
         return {"message": "Username or email already exists"}
 
     # Hash the password and save user to the database
-    hashed_password = hash_password(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     new_user = {"username": user.username, "email": user.email, "password": hashed_password}
     await users_collection.insert_one(new_user)
     return {"message": "User signed up successfully!"}
@@ -218,8 +394,17 @@ async def signup(user: UserSignup):
 @app.post("/login")
 async def login(user: UserLogin):
     existing_user = await users_collection.find_one({"username": user.username})
-    if not existing_user or not verify_password(user.password, existing_user["password"]):
-        return {"message": "Invalid username or password"}
+    try:
+        if not existing_user or not await password_hasher.verify(user.password, existing_user["password"]):
+            return {"message": "Invalid username or password"}
+
+        # Transparently upgrade hashes created with a different work factor
+        if password_hasher.needs_rehash(existing_user["password"]):
+            new_hash = await password_hasher.hash(user.password)
+            await users_collection.update_one({"_id": existing_user["_id"]},
+                                              {"$set": {"password": new_hash}})
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
 
     token = create_jwt(user.username)
     return {"message": f"Welcome, {user.username}!", "token": token}
@@ -232,12 +417,6 @@ async def generate_recommendations(data):
     Ensures at least 3-5 recommendations.
     """
     try:
-        # Establish MongoDB connection
-        uri = os.getenv("MONGODB_URL")
-        client = MongoClient(uri, server_api=ServerApi('1'))
-        db = client.social_media_products
-        product_collection = db["products"]
-
         category = data.get("category", None)
         subcategory = data.get("subcategory", None)
         key_features = data.get("key_features", [])
@@ -248,37 +427,13 @@ async def generate_recommendations(data):
             return [{"name": "No recommendations available", "price": "N/A",
                      "url": "#"}]
 
-        # Primary query: match category and at least one key feature
-        primary_query = {
-            "category": category,
-            "subcategory": subcategory,
-            "common_features": {"$in": key_features}
-        }
-
-        # Fallback query: match only the category if primary query has insufficient results
-        fallback_query = {"category": category,
-                          "subcategory": subcategory}
-
-        # Fetch recommendations
-        recommendations = list(product_collection.find(primary_query).limit(5))
-        if len(recommendations) < 3:
-            additional_recommendations = list(
-                product_collection.find(fallback_query).limit(
-                    5 - len(recommendations))
-            )
-            recommendations.extend(additional_recommendations)
-
-        # Format recommendations
-        formatted_recommendations = [
-            {
-                "name": product.get("brand_options", ["Unknown Product"])[0],
-                "price": product.get("price_ranges", {}).get("mid_range",
-                                                             {}).get("min",
-                                                                     "N/A"),
-                "features": product.get("common_features", []),
-            }
-            for product in recommendations
-        ]
+        if recommendation_index.ready:
+            # Dictionary lookup against the precomputed index
+            formatted_recommendations = recommendation_index.lookup(
+                category, subcategory, key_features)
+        else:
+            formatted_recommendations = await _query_recommendations(
+                category, subcategory, key_features)
 
         # Return default if still insufficient recommendations
         if not formatted_recommendations:
@@ -292,8 +447,42 @@ async def generate_recommendations(data):
         logger.error(f"Error generating recommendations: {str(e)}")
         return [{"name": "Error generating recommendations", "price": "N/A",
                  "url": "#"}]
-    finally:
-        client.close()
+
+
+async def _query_recommendations(category, subcategory, key_features):
+    """
+    Query recommendations from MongoDB while the recommendation index is not ready.
+    """
+    # Primary branch matches at least one key feature, the fallback branch
+    # only the category; both run in a single aggregation round trip
+    pipeline = [
+        {"$match": {"category": category, "subcategory": subcategory}},
+        {"$facet": {
+            "primary": [
+                {"$match": {"common_features": {"$in": key_features}}},
+                {"$limit": 5}
+            ],
+            # Room for up to 2 primary matches that are skipped below
+            "fallback": [
+                {"$limit": 7}
+            ]
+        }}
+    ]
+
+    # Fetch recommendations
+    recommendations = []
+    async for facets in product_collection.aggregate(pipeline):
+        recommendations = facets["primary"]
+        if len(recommendations) < 3:
+            seen_ids = {product["_id"] for product in recommendations}
+            additional_recommendations = [
+                product for product in facets["fallback"]
+                if product["_id"] not in seen_ids
+            ]
+            recommendations.extend(
+                additional_recommendations[:5 - len(recommendations)])
+
+    return [format_recommendation(product) for product in recommendations]
 
 
 # def _parse_recommendations(response_text):
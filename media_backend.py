@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from functools import lru_cache
+from time import perf_counter
+import cv2
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+try:
+    import av
+except ImportError:  # PyAV is optional, used only when installed
+    av = None
+
+try:
+    import imageio_ffmpeg
+except ImportError:  # imageio-ffmpeg is optional, a bundled ffmpeg fallback
+    imageio_ffmpeg = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Preferred backends, fastest first; override with comma-separated names
+AUDIO_BACKENDS = [name.strip() for name in os.getenv("MEDIA_AUDIO_BACKENDS", "ffmpeg,pyav").split(",") if name.strip()]
+FRAME_BACKENDS = [name.strip() for name in os.getenv("MEDIA_FRAME_BACKENDS", "opencv,pyav").split(",") if name.strip()]
+# Decoder threads for ffmpeg; 0 lets ffmpeg choose
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "0"))
+
+
+def resolve_ffmpeg():
+    """Find ffmpeg: FFMPEG_PATH, then PATH, then the imageio-ffmpeg bundled binary"""
+    configured = os.getenv("FFMPEG_PATH")
+    if configured:
+        if os.path.exists(configured):
+            return configured
+        logger.warning(f"FFMPEG_PATH {configured} does not exist, searching elsewhere")
+
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+
+    if imageio_ffmpeg is not None:
+        try:
+            return imageio_ffmpeg.get_ffmpeg_exe()
+        except RuntimeError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=None)
+def probe_ffmpeg(ffmpeg_path):
+    """Query an ffmpeg binary's version, decoders and hardware accelerators (once per process)"""
+    def run(*args):
+        return subprocess.run([ffmpeg_path, "-hide_banner", *args], capture_output=True,
+                              text=True, timeout=10).stdout
+
+    version = run("-version").splitlines()
+    decoders = set()
+    for line in run("-decoders").splitlines():
+        parts = line.split()
+        # Decoder rows look like " V....D h264   H.264 / AVC ..."
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in "VAS":
+            decoders.add(parts[1])
+    hwaccels = [line.strip() for line in run("-hwaccels").splitlines()[1:] if line.strip()]
+
+    return {
+        "path": ffmpeg_path,
+        "version": version[0] if version else None,
+        "decoders": decoders,
+        "hwaccels": hwaccels,
+        "threads": FFMPEG_THREADS or os.cpu_count(),
+    }
+
+
+def _to_analysis_image(rgb, max_side):
+    """Downscale an RGB array so its longest side is at most max_side and convert it to PIL"""
+    height, width = rgb.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        rgb = cv2.resize(rgb, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return Image.fromarray(rgb)
+
+
+class FFmpegBackend:
+    """Audio decoding through an ffmpeg subprocess writing raw PCM to a pipe"""
+    name = "ffmpeg"
+
+    def __init__(self, ffmpeg_path):
+        self.ffmpeg_path = ffmpeg_path
+
+    @classmethod
+    def create(cls):
+        path = resolve_ffmpeg()
+        if not path:
+            return None
+        # A binary that cannot even list its decoders will not decode audio either
+        try:
+            probe_ffmpeg(path)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"ffmpeg at {path} is not usable: {e}")
+            return None
+        return cls(path)
+
+    def capabilities(self):
+        try:
+            return probe_ffmpeg(self.ffmpeg_path)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not probe ffmpeg at {self.ffmpeg_path}: {e}")
+            return {"path": self.ffmpeg_path}
+
+    def audio_command(self, video_path, sample_rate):
+        """ffmpeg command that writes mono float32 PCM at sample_rate to stdout"""
+        command = [str(self.ffmpeg_path), '-nostdin', '-loglevel', 'error']
+        if FFMPEG_THREADS:
+            command += ['-threads', str(FFMPEG_THREADS)]
+        return command + [
+            '-i', str(video_path),
+            '-vn',
+            '-ac', '1',
+            '-ar', str(sample_rate),
+            '-f', 'f32le',
+            'pipe:1'
+        ]
+
+    async def decode_audio(self, video_path, sample_rate):
+        process = await asyncio.create_subprocess_exec(
+            *self.audio_command(video_path, sample_rate),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        pcm, errors = await process.communicate()
+
+        if process.returncode != 0 or not pcm:
+            logger.warning(f"No audio decoded from {video_path}: {errors.decode(errors='replace').strip()}")
+            return None
+
+        # A read-only view over ffmpeg's output; no copy, no resample
+        return np.frombuffer(pcm, dtype=np.float32, count=len(pcm) // 4)
+
+    async def stream_audio(self, video_path, sample_rate, chunk_samples):
+        """Yield mono float32 chunks while ffmpeg is still decoding"""
+        chunk_bytes = chunk_samples * 4
+        process = await asyncio.create_subprocess_exec(
+            *self.audio_command(video_path, sample_rate),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # Drained alongside stdout so a chatty ffmpeg cannot fill the pipe and stall
+        errors = asyncio.create_task(process.stderr.read())
+        try:
+            while True:
+                try:
+                    pcm = await process.stdout.readexactly(chunk_bytes)
+                except asyncio.IncompleteReadError as e:
+                    pcm = e.partial[:len(e.partial) // 4 * 4]
+                    if pcm:
+                        yield np.frombuffer(pcm, dtype=np.float32)
+                    break
+                yield np.frombuffer(pcm, dtype=np.float32)
+
+            if await process.wait() != 0:
+                logger.warning(f"ffmpeg failed to decode audio from {video_path}: "
+                               f"{(await errors).decode(errors='replace').strip()}")
+        finally:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            errors.cancel()
+
+
+class OpenCVBackend:
+    """Frame sampling through OpenCV's bundled decoder"""
+    name = "opencv"
+
+    @classmethod
+    def create(cls):
+        return cls()
+
+    def capabilities(self):
+        return {"version": cv2.__version__, "threads": cv2.getNumThreads()}
+
+    def sample_frames(self, video_path, num_frames, max_side):
+        """Decode the video in one forward pass, keeping only the sampled frames"""
+        frames = []
+        cap = cv2.VideoCapture(str(video_path))
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total_frames <= 0:
+                return frames
+
+            wanted = set(np.linspace(0, total_frames - 1, num_frames, dtype=int).tolist())
+            last_wanted = max(wanted)
+            # grab() advances without converting; only wanted frames are retrieved
+            for idx in range(last_wanted + 1):
+                if not cap.grab():
+                    break
+                if idx in wanted:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        frames.append(_to_analysis_image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), max_side))
+        finally:
+            cap.release()
+
+        return frames
+
+
+class PyAVBackend:
+    """Audio decoding and frame sampling in-process through PyAV (libav bindings)"""
+    name = "pyav"
+
+    @classmethod
+    def create(cls):
+        return cls() if av is not None else None
+
+    def capabilities(self):
+        return {"version": av.__version__, "threads": FFMPEG_THREADS or os.cpu_count()}
+
+    def _decode_audio(self, video_path, sample_rate):
+        with av.open(str(video_path)) as container:
+            if not container.streams.audio:
+                return None
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+            chunks = []
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    chunks.append(resampled.to_ndarray().reshape(-1))
+            for resampled in resampler.resample(None):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        return np.concatenate(chunks) if chunks else None
+
+    async def decode_audio(self, video_path, sample_rate):
+        return await asyncio.to_thread(self._decode_audio, video_path, sample_rate)
+
+    async def stream_audio(self, video_path, sample_rate, chunk_samples):
+        waveform = await self.decode_audio(video_path, sample_rate)
+        if waveform is not None:
+            for start in range(0, len(waveform), chunk_samples):
+                yield waveform[start:start + chunk_samples]
+
+    def sample_frames(self, video_path, num_frames, max_side):
+        """Seek to evenly spaced timestamps, decoding only from the nearest keyframe"""
+        frames = []
+        with av.open(str(video_path)) as container:
+            if not container.streams.video:
+                return frames
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            if not stream.duration:
+                return frames
+
+            for target in np.linspace(0, stream.duration - 1, num_frames, dtype=np.int64).tolist():
+                container.seek(int(target) + (stream.start_time or 0), stream=stream)
+                for frame in container.decode(stream):
+                    if frame.pts is None or frame.pts >= target + (stream.start_time or 0):
+                        frames.append(_to_analysis_image(frame.to_ndarray(format="rgb24"), max_side))
+                        break
+        return frames
+
+
+BACKENDS = {backend.name: backend for backend in (FFmpegBackend, OpenCVBackend, PyAVBackend)}
+
+
+def _first_available(names, method):
+    """First backend in names that implements method and works on this host"""
+    for name in names:
+        backend_class = BACKENDS.get(name)
+        if backend_class is None:
+            logger.warning(f"Unknown media backend {name}")
+            continue
+        if not hasattr(backend_class, method):
+            logger.warning(f"Media backend {name} cannot {method.replace('_', ' ')}, skipping it")
+            continue
+        backend = backend_class.create()
+        if backend is not None:
+            return backend
+    return None
+
+
+def audio_backend():
+    """The first available backend in AUDIO_BACKENDS, or None"""
+    return _first_available(AUDIO_BACKENDS, "stream_audio")
+
+
+def frame_backend():
+    """The first available backend in FRAME_BACKENDS, or None"""
+    return _first_available(FRAME_BACKENDS, "sample_frames")
+
+
+def benchmark(video_path, num_frames=24, max_side=768, sample_rate=16000, repeat=3):
+    """
+    Time every available backend on the same video
+    :return: {backend name: {"frames_seconds": ..., "audio_seconds": ...}} (best of `repeat`)
+    """
+    results = {}
+    for name, backend_class in BACKENDS.items():
+        backend = backend_class.create()
+        if backend is None:
+            continue
+        timings = {}
+        if hasattr(backend, "sample_frames"):
+            timings["frames_seconds"] = min(
+                _timed(backend.sample_frames, video_path, num_frames, max_side) for _ in range(repeat))
+        if hasattr(backend, "decode_audio"):
+            timings["audio_seconds"] = min(
+                _timed(asyncio.run, backend.decode_audio(video_path, sample_rate)) for _ in range(repeat))
+        results[name] = timings
+    return results
+
+
+def _timed(func, *args):
+    start = perf_counter()
+    func(*args)
+    return round(perf_counter() - start, 4)
+
+
+if __name__ == "__main__":
+    for backend_name, backend_timings in benchmark(sys.argv[1]).items():
+        print(backend_name, backend_timings)
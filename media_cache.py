@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import logging
+import os
+from pathlib import Path
+from filelock import FileLock, Timeout
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows; open files cannot be deleted there anyway
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Cache configuration
+CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", "temp/media_cache"))
+CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# How long to wait for another process downloading the same URL
+LOCK_TIMEOUT = float(os.getenv("MEDIA_CACHE_LOCK_TIMEOUT", "600"))
+CACHE_SUFFIX = ".mp4"
+
+
+def url_digest(url: str, variant: str = "") -> str:
+    """
+    Stable cache key for a URL; unlike hash(), identical in every process
+    :param variant: Settings that change what is downloaded, so different fetches of one URL do not collide
+    """
+    return hashlib.sha256(f"{variant}\n{url.strip()}".encode("utf-8")).hexdigest()
+
+
+class MediaCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, variant=""):
+        """
+        On-disk LRU of downloaded media, keyed by URL digest
+        :param directory: Where cached files live
+        :param max_bytes: Total size above which least recently used files are evicted
+        :param variant: Download settings folded into every key (see url_digest)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.variant = variant
+        self._inflight = {}
+        self._pins = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def path_for(self, url):
+        return self.directory / f"{url_digest(url, self.variant)}{CACHE_SUFFIX}"
+
+    def lookup(self, url):
+        """Return the cached file for a URL, marking it as recently used, or None"""
+        path = self.path_for(url)
+        try:
+            # mtime doubles as the last-used time for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def fetch(self, url, download):
+        """
+        Return the cached file for a URL, downloading it on a miss
+        Concurrent callers for the same URL share one download: tasks in this process
+        through a shared future, other processes through a lock file next to the entry.
+        The returned path is pinned against eviction, in every process, until release() is called.
+        :param download: async callable(url, destination) -> bool
+        """
+        digest = url_digest(url, self.variant)
+        path = self.lookup(url)
+        if path is not None:
+            self.hits += 1
+        elif digest in self._inflight:
+            self.shared += 1
+            future = self._inflight[digest]
+            try:
+                path = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The task that was downloading it was cancelled; take the download over
+                return await self.fetch(url, download)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[digest] = future
+            try:
+                path = await self._download(url, download)
+                future.set_result(path)
+            except Exception as e:
+                future.set_exception(e)
+                # Nobody else may be awaiting; retrieve the exception so it is not logged as lost
+                future.exception()
+                raise
+            finally:
+                # Cancelled mid-download: wake the waiters so one of them retries
+                if not future.done():
+                    future.cancel()
+                del self._inflight[digest]
+
+            if path is not None:
+                # Pin before evicting, so a download larger than max_bytes is not deleted on arrival
+                self._pin(path)
+                await asyncio.to_thread(self._evict)
+            return path
+
+        if path is not None:
+            self._pin(path)
+        return path
+
+    def _pin(self, path):
+        count, handle = self._pins.get(path, (0, None))
+        if handle is None and fcntl is not None:
+            # A shared lock on the entry tells _evict in other processes that it is in use
+            try:
+                handle = open(path, "rb")
+                fcntl.flock(handle, fcntl.LOCK_SH)
+            except OSError as e:
+                logger.debug(f"Could not pin {path}: {e}")
+        self._pins[path] = (count + 1, handle)
+
+    async def _download(self, url, download):
+        path = self.path_for(url)
+        # Not thread-local: it is acquired on a worker thread but released from the event loop
+        lock = FileLock(str(path) + ".lock", timeout=LOCK_TIMEOUT, thread_local=False)
+        acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except Timeout:
+            logger.warning(f"Timed out after {LOCK_TIMEOUT}s waiting for another download of {url}")
+            return None
+        except asyncio.CancelledError:
+            # The thread still gets the lock; release it once it does
+            acquiring.add_done_callback(lambda done: not done.cancelled() and done.exception() is None and lock.release())
+            raise
+        try:
+            # Another process may have finished the download while we waited for the lock
+            if self.lookup(url) is not None:
+                self.hits += 1
+                return path
+
+            self.misses += 1
+            partial = path.with_name(f"{path.stem}.download{CACHE_SUFFIX}")
+            if not await download(url, partial) or not partial.exists():
+                return None
+            os.replace(partial, path)
+        finally:
+            lock.release()
+        return path
+
+    def release(self, path):
+        """Allow a file returned by fetch() to be evicted again"""
+        count, handle = self._pins.get(path, (0, None))
+        if count > 1:
+            self._pins[path] = (count - 1, handle)
+            return
+        self._pins.pop(path, None)
+        if handle is not None:
+            handle.close()
+
+    def _entries(self):
+        entries = []
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            if ".download" in path.name:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits in max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path in self._pins or not self._unlink_unused(path):
+                continue
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted {path.name} ({size} bytes) from media cache")
+
+    @staticmethod
+    def _unlink_unused(path):
+        """Delete a cache file unless some process holds it pinned"""
+        try:
+            with open(path, "rb") as handle:
+                if fcntl is not None:
+                    # Fails while any process holds the shared pin lock
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                path.unlink()
+        except OSError as e:
+            # Pinned elsewhere, or still open on platforms that forbid deleting open files
+            logger.debug(f"Could not evict {path}: {e}")
+            return False
+        return True
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_downloads": self.shared,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,81 @@
+import google.generativeai as genai
+import asyncio
+import os
+import logging
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini-1.5-pro-latest"
+
+# Per-process limits for in-flight Gemini calls
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+
+_semaphore = None
+_clients = {}
+
+
+def _get_semaphore():
+    """Return the process-wide semaphore capping concurrent model calls"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _semaphore
+
+
+class ModelClient:
+    def __init__(self, model_name=DEFAULT_MODEL, timeout=REQUEST_TIMEOUT):
+        """
+        Non-blocking wrapper around a Gemini model
+        :param model_name: Name of the Gemini model
+        :param timeout: Default per-call timeout in seconds
+        """
+        self.model_name = model_name
+        self.timeout = timeout
+        self.model = genai.GenerativeModel(model_name)
+        self.in_flight = 0
+        self.total_calls = 0
+        self.timeouts = 0
+
+    async def generate_content(self, contents, timeout=None):
+        """Generate content without blocking the event loop"""
+        timeout = timeout or self.timeout
+        async with _get_semaphore():
+            self.in_flight += 1
+            self.total_calls += 1
+            try:
+                return await asyncio.wait_for(
+                    self.model.generate_content_async(
+                        contents,
+                        request_options={"timeout": timeout}
+                    ),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error(f"Gemini call to {self.model_name} timed out after {timeout}s")
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "in_flight": self.in_flight,
+            "total_calls": self.total_calls,
+            "timeouts": self.timeouts,
+            "max_concurrency": MAX_CONCURRENT_REQUESTS,
+        }
+
+
+def get_model_client(model_name=DEFAULT_MODEL):
+    """Return the shared client for a model, creating it on first use"""
+    client = _clients.get(model_name)
+    if client is None:
+        client = ModelClient(model_name)
+        _clients[model_name] = client
+    return client
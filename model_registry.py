@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import threading
+from time import perf_counter
+from dotenv import load_dotenv
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, only used for memory reporting
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+WAV2VEC_MODEL = "facebook/wav2vec2-base-960h"
+
+
+def _resident_memory():
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class ModelRegistry:
+    def __init__(self):
+        """Process-wide registry that loads heavy models on first use and shares them"""
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._stats = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Return a model, loading it if this is the first use in the process"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            logger.info(f"Loading model {name}")
+            rss_before = _resident_memory()
+            start = perf_counter()
+            model = self._loaders[name]()
+            load_seconds = round(perf_counter() - start, 3)
+            rss_after = _resident_memory()
+
+            self._models[name] = model
+            self._stats[name] = {
+                "load_seconds": load_seconds,
+                "resident_bytes": (rss_after - rss_before) if rss_before is not None else None,
+            }
+            logger.info(f"Loaded model {name} in {load_seconds}s")
+            return model
+
+    async def aget(self, name):
+        """Like get, but loads off the event loop"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        return await asyncio.to_thread(self.get, name)
+
+    def preload(self, names):
+        for name in names:
+            self.get(name)
+
+    def stats(self):
+        return {
+            "process_resident_bytes": _resident_memory(),
+            "models": {
+                name: {"loaded": name in self._models, **self._stats.get(name, {})}
+                for name in self._loaders
+            }
+        }
+
+
+def _load_wav2vec_processor():
+    from transformers import Wav2Vec2Processor
+    return Wav2Vec2Processor.from_pretrained(WAV2VEC_MODEL)
+
+
+def _load_wav2vec_model():
+    from transformers import Wav2Vec2ForCTC
+    model = Wav2Vec2ForCTC.from_pretrained(WAV2VEC_MODEL)
+    model.eval()
+    return model
+
+
+model_registry = ModelRegistry()
+model_registry.register("wav2vec2_processor", _load_wav2vec_processor)
+model_registry.register("wav2vec2_model", _load_wav2vec_model)
+
+
+def warmup():
+    """Preload the models listed in PRELOAD_MODELS (comma separated)"""
+    names = [name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()]
+    if names:
+        model_registry.preload(names)
@@ -0,0 +1,63 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def clamp_limit(limit) -> int:
+    """Apply the default page size and the hard cap"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def projection_for(model) -> dict:
+    """Build a MongoDB projection holding only the fields of a response model"""
+    return {field: 1 for field in model.model_fields if field != "id"}
+
+
+def parse_cursor(after: str):
+    try:
+        return ObjectId(after)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+async def fetch_page(collection, query: dict, model, limit: int = DEFAULT_PAGE_SIZE, after: str = None):
+    """
+    Fetch one page of documents ordered by _id using keyset pagination
+    :return: (documents, next_cursor); next_cursor is None on the last page
+    """
+    limit = clamp_limit(limit)
+    if after:
+        query = {"$and": [query, {"_id": {"$gt": parse_cursor(after)}}]}
+
+    # Read one extra document to know whether another page exists
+    cursor = collection.find(query, projection_for(model)).sort("_id", 1).limit(limit + 1)
+    documents = await cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = str(documents[-1]["_id"])
+    return documents, next_cursor
+
+
+def page_ranked(ranked: list, limit: int = DEFAULT_PAGE_SIZE, after: str = None):
+    """
+    Slice a ranked [(doc_id, score)] list after the document named by the cursor
+    :return: (page, next_cursor)
+    """
+    limit = clamp_limit(limit)
+    start = 0
+    if after:
+        position = next((i for i, (doc_id, _) in enumerate(ranked) if str(doc_id) == after), None)
+        if position is None:
+            return [], None
+        start = position + 1
+
+    page = ranked[start:start + limit]
+    next_cursor = str(page[-1][0]) if page and start + limit < len(ranked) else None
+    return page, next_cursor
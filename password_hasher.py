@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from bcrypt import hashpw, gensalt, checkpw
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# bcrypt work factor and executor limits
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_PENDING_HASHES = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue stays full for longer than QUEUE_TIMEOUT"""
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    return hashpw(password.encode('utf-8'), gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _ready() -> bool:
+    return True
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """Read the work factor from a bcrypt hash such as $2b$12$..."""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, max_workers=HASH_WORKERS,
+                 max_pending=MAX_PENDING_HASHES):
+        """
+        Runs bcrypt in a process pool so hashing never blocks the event loop
+        :param rounds: bcrypt work factor for new hashes
+        :param max_workers: Number of hashing processes
+        :param max_pending: Maximum hashes queued or running at once
+        """
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawned workers do not inherit the server's threads, sockets or event loop
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def start(self):
+        """Spawn every worker now, so the first logins do not wait for process start-up"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.max_workers)))
+
+    async def _submit(self, func, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Password hashing queue is full, rejecting request")
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return hash_rounds(hashed_password) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBucketState:
+    """Token bucket state held in this process"""
+    blocking = False
+
+    def __init__(self):
+        self.tokens = None
+        self.last_update = time.monotonic()
+
+    def take(self, tokens, rate, capacity):
+        """Take tokens if available; otherwise return the seconds until they will be"""
+        now = time.monotonic()
+        if self.tokens is None:
+            self.tokens = capacity
+        self.tokens = min(capacity, self.tokens + (now - self.last_update) * rate)
+        self.last_update = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / rate
+
+
+class SQLiteBucketState:
+    """Token bucket state shared by every process using the same SQLite file"""
+    blocking = True
+
+    def __init__(self, path, name="gemini"):
+        self.path = path
+        self.name = name
+        self._connection = None
+        self._pid = None
+        # to_thread calls share the connection; one transaction on it at a time
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Connections must not cross a fork, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, last_update REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def take(self, tokens, rate, capacity):
+        with self._lock:
+            return self._take(tokens, rate, capacity)
+
+    def _take(self, tokens, rate, capacity):
+        connection = self._connect()
+        # BEGIN IMMEDIATE takes the write lock, serializing all processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, last_update FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            available = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / rate
+
+            connection.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, tokens, last_update) VALUES (?, ?, ?)",
+                (self.name, available, now)
+            )
+            connection.execute("COMMIT")
+            return wait
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def bucket_state_from_env(name="gemini"):
+    """Use a shared SQLite bucket when GEMINI_RATE_LIMIT_DB is set, else a local one"""
+    path = os.getenv("GEMINI_RATE_LIMIT_DB")
+    if path:
+        return SQLiteBucketState(path, name)
+    return LocalBucketState()
+
+
+class TokenBucket:
+    def __init__(self, tokens_per_second=0.05, max_tokens=10, state=None):
+        """
+        Token bucket with exact wakeups and FIFO waiters
+        :param tokens_per_second: Refill rate
+        :param max_tokens: Bucket capacity
+        :param state: Where tokens are stored; LocalBucketState or SQLiteBucketState
+        """
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.state = state or LocalBucketState()
+        # asyncio.Lock wakes waiters in FIFO order, so the oldest caller is served first
+        self._queue = asyncio.Lock()
+
+    async def _take(self, tokens):
+        if tokens > self.max_tokens:
+            raise ValueError(f"Cannot take {tokens} tokens from a bucket of {self.max_tokens}")
+        if self.state.blocking:
+            return await asyncio.to_thread(self.state.take, tokens, self.tokens_per_second, self.max_tokens)
+        return self.state.take(tokens, self.tokens_per_second, self.max_tokens)
+
+    async def acquire(self, tokens=1):
+        """Take tokens without waiting; never jumps ahead of queued waiters"""
+        if self._queue.locked():
+            return False
+        return await self._take(tokens) == 0.0
+
+    async def wait(self, tokens=1):
+        """Wait until tokens are available and take them"""
+        async with self._queue:
+            while True:
+                delay = await self._take(tokens)
+                if delay == 0.0:
+                    return
+                # Sleep exactly until enough tokens accrue; with a shared state another
+                # process may take them first, in which case the loop waits again
+                await asyncio.sleep(delay)
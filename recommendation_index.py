@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import logging
+import os
+import sys
+from datetime import datetime
+from time import perf_counter
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Index configuration
+TOP_K = 5
+REFRESH_INTERVAL_SECONDS = int(os.getenv("RECOMMENDATION_REFRESH_SECONDS", "600"))
+CHANGE_DEBOUNCE_SECONDS = 2
+
+PRODUCT_PROJECTION = {
+    "category": 1,
+    "subcategory": 1,
+    "brand_options": 1,
+    "price_ranges": 1,
+    "common_features": 1,
+}
+
+
+def format_recommendation(product):
+    """Format a product document as a recommendation"""
+    return {
+        "name": product.get("brand_options", ["Unknown Product"])[0],
+        "price": product.get("price_ranges", {}).get("mid_range", {}).get("min", "N/A"),
+        "features": product.get("common_features", []),
+    }
+
+
+def _deep_sizeof(obj, seen=None):
+    """Approximate the memory used by nested dicts, lists and tuples"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class RecommendationIndex:
+    def __init__(self, collection, top_k=TOP_K, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        """
+        In-process recommendation index keyed by category/subcategory/feature
+        :param collection: Motor collection holding the products
+        :param top_k: Number of recommendations returned per lookup
+        :param refresh_interval: Rebuild period when change streams are unavailable
+        """
+        self.collection = collection
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self._groups = {}
+        self.ready = False
+        self.refresh_mode = None
+        self.products_indexed = 0
+        self.build_seconds = 0.0
+        self.memory_bytes = 0
+        self.last_built_at = None
+
+    async def build(self):
+        """Rebuild the index from the products collection"""
+        start = perf_counter()
+        groups = {}
+        count = 0
+        # Fallback lists keep two extra entries for products already matched by feature
+        fallback_size = self.top_k + 2
+
+        async for product in self.collection.find({}, PRODUCT_PROJECTION):
+            key = (product.get("category"), product.get("subcategory"))
+            group = groups.setdefault(key, {"top": [], "features": {}})
+            entry = (count, str(product["_id"]), format_recommendation(product))
+
+            if len(group["top"]) < fallback_size:
+                group["top"].append(entry)
+            for feature in product.get("common_features", []):
+                feature_list = group["features"].setdefault(feature, [])
+                if len(feature_list) < self.top_k:
+                    feature_list.append(entry)
+            count += 1
+
+        self._groups = groups
+        self.ready = True
+        self.products_indexed = count
+        self.build_seconds = round(perf_counter() - start, 4)
+        self.memory_bytes = _deep_sizeof(groups)
+        self.last_built_at = datetime.utcnow().isoformat()
+        logger.info(f"Recommendation index built: {count} products in {self.build_seconds}s")
+
+    def lookup(self, category, subcategory, features):
+        """Return formatted recommendations, matching features first"""
+        group = self._groups.get((category, subcategory))
+        if not group:
+            return []
+
+        # Merge the per-feature lists in collection order, like a $in query would
+        feature_lists = [group["features"][f] for f in set(features) if f in group["features"]]
+        recommendations = []
+        seen_ids = set()
+        for _, product_id, recommendation in heapq.merge(*feature_lists):
+            if product_id in seen_ids:
+                continue
+            seen_ids.add(product_id)
+            recommendations.append(recommendation)
+            if len(recommendations) == self.top_k:
+                break
+
+        if len(recommendations) < 3:
+            for _, product_id, recommendation in group["top"]:
+                if len(recommendations) == self.top_k:
+                    break
+                if product_id not in seen_ids:
+                    recommendations.append(recommendation)
+
+        return recommendations
+
+    async def run(self):
+        """Keep the index fresh from a change stream, or on a timer"""
+        while True:
+            try:
+                async with self.collection.watch() as stream:
+                    self.refresh_mode = "change_stream"
+                    async for _ in stream:
+                        # Let bursts of writes settle before rebuilding once
+                        await asyncio.sleep(CHANGE_DEBOUNCE_SECONDS)
+                        while await stream.try_next() is not None:
+                            pass
+                        await self.build()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure:
+                # Change streams need a replica set; fall back to polling
+                self.refresh_mode = "timer"
+                while True:
+                    await asyncio.sleep(self.refresh_interval)
+                    try:
+                        await self.build()
+                    except PyMongoError as e:
+                        logger.error(f"Error rebuilding recommendation index: {e}")
+            except PyMongoError as e:
+                logger.error(f"Recommendation change stream failed: {e}")
+                await asyncio.sleep(self.refresh_interval)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "refresh_mode": self.refresh_mode,
+            "products_indexed": self.products_indexed,
+            "groups": len(self._groups),
+            "features": sum(len(g["features"]) for g in self._groups.values()),
+            "build_seconds": self.build_seconds,
+            "memory_bytes": self.memory_bytes,
+            "last_built_at": self.last_built_at,
+        }
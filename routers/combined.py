@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from typing import Optional
+from pagination import DEFAULT_PAGE_SIZE
 from schemas.combined import search_all_content
 
 router = APIRouter()
@@ -7,5 +9,11 @@ router = APIRouter()
     summary="Search All Content",
     description="Search both products and videos across all categories."
 )
-async def search_all_content_(query: str):
-    return await search_all_content(query)
\ No newline at end of file
+async def search_all_content_(
+    query: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    products_after: Optional[str] = None,
+    videos_after: Optional[str] = None,
+    partial: bool = True
+):
+    return await search_all_content(query, limit, products_after, videos_after, partial)
\ No newline at end of file
@@ -1,7 +1,8 @@
-from fastapi import APIRouter
-from fastapi import File, UploadFile, Form
-from typing import List, Optional
+from fastapi import APIRouter, Request
+from typing import Optional
 import logging
+from pagination import DEFAULT_PAGE_SIZE
+from upload_ingest import read_upload_form, require_field, multipart_openapi, TOO_MANY_IMAGES
 from schemas.image import (
     upload_image,
     search_products,
@@ -19,29 +20,32 @@ logger = logging.getLogger(__name__)
 
 @router.post("/", 
     summary="Upload Product Image",
-    description="Upload and analyze a product image for listing generation."
+    description="Upload and analyze a product image for listing generation.",
+    openapi_extra=multipart_openapi("files", many=True, required_fields=["title"], optional_fields=["caption"])
 )
 
-async def upload_image_route(
-    files: List[UploadFile] = File(...),
-    title: str = Form(...),
-    caption: Optional[str] = Form(None)
-):
-    return await upload_image(files, title, caption)
+async def upload_image_route(request: Request):
+    # The body is streamed with size and count limits rather than parsed up front
+    fields, files = await read_upload_form(request, file_fields=("files",), too_many_files=TOO_MANY_IMAGES)
+    try:
+        return await upload_image(files, require_field(fields, "title"), fields.get("caption"))
+    finally:
+        for file in files:
+            await file.close()
 
 @router.get("/search/{title}",
     summary="Search Products",
     description="Search for products by title across different categories."
 )
-async def search_products_route(title: str):
-    return await search_products(title)
+async def search_products_route(title: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    return await search_products(title, limit, after)
 
 @router.get("/listings/{product_id}",
     summary="Get Product Listings",
     description="Get all listings for a specific product."
 )
-async def get_product_listings_route(product_id: str):
-    return await get_product_listings(product_id)
+async def get_product_listings_route(product_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    return await get_product_listings(product_id, limit, after)
 
 @router.get("/compare/{product_id}",
     summary="Get Comparable Products",
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Request
+from job_queue import MAX_UPLOAD_BYTES
+from upload_ingest import multipart_openapi
+from schemas.jobs import (
+    submit_video_job,
+    get_video_job,
+    stream_video_job
+)
+
+router = APIRouter()
+
+@router.post("/",
+    summary="Submit Video Job",
+    description=f"Queue a video URL or upload (up to {MAX_UPLOAD_BYTES // (1024 * 1024)}MB) "
+                "for background analysis and return a job id.",
+    openapi_extra=multipart_openapi("file", optional_fields=("url",), file_required=False)
+)
+async def submit_video_job_route(request: Request):
+    return await submit_video_job(request)
+
+@router.get("/{job_id}",
+    summary="Get Video Job",
+    description="Get the status and, once finished, the result of a video job."
+)
+async def get_video_job_route(job_id: str):
+    return await get_video_job(job_id)
+
+@router.get("/{job_id}/events",
+    summary="Stream Video Job Events",
+    description="Subscribe to a video job's status changes as server-sent events."
+)
+async def stream_video_job_route(job_id: str):
+    return await stream_video_job(job_id)
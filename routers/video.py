@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from typing import Optional
 from fastapi import File, UploadFile, Form
+from pagination import DEFAULT_PAGE_SIZE
 from schemas.video import (
     upload_video,
     search_videos,
@@ -26,8 +27,8 @@ async def upload_video_route(
     summary="Search Videos",
     description="Search for product videos by title."
 )
-async def search_videos_route(title: str):
-    return await search_videos(title)
+async def search_videos_route(title: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    return await search_videos(title, limit, after)
 
 @router.get("/listings/{video_id}",
     summary="Get Video Listings",
@@ -1,33 +1,86 @@
 from fastapi import APIRouter, HTTPException
+from typing import Optional
+from models.product import Product
+from models.video import Video
+from pagination import DEFAULT_PAGE_SIZE, projection_for
+import asyncio
+import logging
+import os
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Seconds each content source gets to answer before it is left out
+SOURCE_TIMEOUT = float(os.getenv("SEARCH_SOURCE_TIMEOUT", "2"))
+
+def _search_sources():
+    """Content types searched by the combined endpoint: name -> (search index, response model)"""
+    from main import product_search, video_search
+    return {
+        "products": (product_search, Product),
+        "videos": (video_search, Video),
+    }
+
+async def _search_source(index, model, query, limit, after):
+    # A cold index build takes longer than a query; cancelling it at the timeout would
+    # make every request start over, so only the query itself is time-limited
+    await index.ensure_built()
+    documents, next_cursor = await asyncio.wait_for(
+        index.find_page(query, limit, after, projection_for(model)),
+        timeout=SOURCE_TIMEOUT
+    )
+    for document in documents:
+        document["_id"] = str(document["_id"])  # Convert ObjectId to string
+    return documents, next_cursor
 
 # Search both products and videos across all categories.
-async def search_all_content(query: str):
-    from main import product_collection, video_collection
-    
-    search_term = query.lower()
-
-    try:
-        # Search products in MongoDB
-        product_cursor = product_collection.find({"title": {"$regex": search_term, "$options": "i"}})
-        product_results = await product_cursor.to_list(length=None)  # Convert cursor to list
-        for product in product_results:
-            product["_id"] = str(product["_id"])  # Convert ObjectId to string
-
-        # Search videos in MongoDB
-        video_cursor = video_collection.find({"title": {"$regex": search_term, "$options": "i"}})
-        video_results = await video_cursor.to_list(length=None)  # Convert cursor to list
-        for video in video_results:
-            video["_id"] = str(video["_id"])  # Convert ObjectId to string
-
-        return {
-            "status": "success",
-            "results": {
-                "products": product_results,
-                "videos": video_results
-            }
-        }
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        raise HTTPException(status_code=500, detail="Error fetching data from database")
\ No newline at end of file
+async def search_all_content(
+    query: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    products_after: Optional[str] = None,
+    videos_after: Optional[str] = None,
+    partial: bool = True
+):
+    sources = _search_sources()
+    cursors = {"products": products_after, "videos": videos_after}
+
+    # Query every source at once; latency is that of the slowest source
+    outcomes = await asyncio.gather(
+        *(_search_source(index, model, query, limit, cursors.get(name))
+          for name, (index, model) in sources.items()),
+        return_exceptions=True
+    )
+
+    results, next_cursors, unavailable = {}, {}, []
+    for name, outcome in zip(sources, outcomes):
+        if isinstance(outcome, HTTPException):
+            raise outcome
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.warning(f"Search source '{name}' timed out after {SOURCE_TIMEOUT}s")
+            else:
+                logger.error(f"Search source '{name}' failed: {outcome}")
+            unavailable.append(name)
+            results[name], next_cursors[name] = [], None
+            continue
+        results[name], next_cursors[name] = outcome
+
+    if unavailable and (not partial or len(unavailable) == len(sources)):
+        raise HTTPException(status_code=500, detail="Error fetching data from database")
+
+    # Merge every source into one list ordered by relevance
+    ranked = sorted(
+        ({"type": name, "id": document["_id"], "score": document.get("score", 0.0)}
+         for name, documents in results.items() for document in documents),
+        key=lambda item: item["score"],
+        reverse=True
+    )
+
+    return {
+        "status": "success",
+        "results": results,
+        "ranked": ranked,
+        "next_cursors": next_cursors,
+        "partial": bool(unavailable),
+        "unavailable_sources": unavailable
+    }
@@ -8,6 +8,10 @@ from fastapi import File, UploadFile, Form
 from image_data import SAMPLE_RESPONSES
 from typing import List, Optional
 from datetime import datetime
+from image_index import dhash
+from image_ingest import normalize_image
+from pagination import DEFAULT_PAGE_SIZE, fetch_page, projection_for
+import asyncio
 import logging
 
 router = APIRouter()
@@ -20,7 +24,7 @@ async def upload_image(
     title: str = Form(...),
     caption: Optional[str] = Form(None)
 ):
-    from main import db  
+    from main import db, image_index, image_processor
     search_term = title.lower()  
     
     try:
@@ -36,62 +40,121 @@ async def upload_image(
         
         # Process the uploaded files
         processed_files = []
+        image_hashes = []
+        images = []
+        content_hashes = []
         for file in files:
             processed_files.append(file.filename)
+            try:
+                image_hash, image = await asyncio.to_thread(_read_upload, file)
+                image_hashes.append(image_hash)
+                images.append(image)
+                content_hashes.append(getattr(file, "content_hash", None))
+            except Exception as read_error:
+                logger.warning(f"Could not read {file.filename}: {read_error}")
             logger.info(f"Processed file: {file.filename}")
 
+        # Reuse the analysis of a near-duplicate upload if there is one; listings depend on the title,
+        # so they are always looked up
+        cached_analysis = None
+        for image_hash in image_hashes:
+            match = image_index.lookup(image_hash)
+            if match and match[0].get("analysis"):
+                logger.info(f"Near-duplicate image found (distance {match[1]}), reusing analysis")
+                cached_analysis = match[0]["analysis"]
+                break
+
         # Search for listings with similar titles in the database
         try:
-            listings_cursor = db["listings"].find({"title": {"$regex": search_term, "$options": "i"}})
+            listings_cursor = db["listings"].find(
+                {"title": {"$regex": search_term, "$options": "i"}},
+                projection_for(ProductListing)
+            ).limit(DEFAULT_PAGE_SIZE)
         except Exception as db_error:
             logger.error(f"Database error: {db_error}")
             raise HTTPException(status_code=500, detail="Database error occurred")
-        
-        listings = await listings_cursor.to_list(length=None)
+
+        if cached_analysis is not None:
+            listings, analysis = await listings_cursor.to_list(length=DEFAULT_PAGE_SIZE), cached_analysis
+        else:
+            # All photos go to the model together (one round trip) while the listings query runs
+            listings, analysis = await asyncio.gather(
+                listings_cursor.to_list(length=DEFAULT_PAGE_SIZE),
+                _analyze_uploads(image_processor, images, content_hashes)
+            )
+            if analysis is not None:
+                for image_hash in image_hashes:
+                    image_index.add(image_hash, analysis=analysis)
 
         if listings:
             # Convert ObjectId to string for JSON compatibility and return listings
             for listing in listings:
                 listing["id"] = str(listing["_id"])  # Convert _id to id for Pydantic compatibility
 
+            product_listings = [ProductListing(**listing) for listing in listings]
+
             return {
                 "status": "success",
                 "message": f"Successfully processed {len(files)} image(s)",
                 "processed_files": processed_files,
-                "listings": [ProductListing(**listing) for listing in listings]
+                "analysis": analysis,
+                "listings": product_listings
             }
         else:
-            # If no listings are found, return a fallback listing in the correct model format
+            # If no listings are found, build a fallback listing from the analysis where available
+            analysis_fields = analysis or {}
             default_listing = ProductListing(
                 id=f"list_{abs(hash(title))}",
                 product_id="generic_123",
                 title=title,
-                description=caption or "Product description",
-                price="$99.99",
-                features=["Standard feature 1", "Standard feature 2", "Standard feature 3"]
+                description=caption or analysis_fields.get("description") or "Product description",
+                price=analysis_fields.get("price") or "$99.99",
+                features=analysis_fields.get("key_features") or ["Standard feature 1", "Standard feature 2", "Standard feature 3"]
             )
 
             return {
                 "status": "success",
                 "message": f"Successfully processed {len(files)} image(s)",
                 "processed_files": processed_files,
+                "analysis": analysis,
                 "listings": [default_listing]  # Convert Pydantic model to dictionary
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing upload: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _read_upload(file: UploadFile):
+    """Decode and normalize an uploaded image, returning its perceptual hash and the image, and rewind the file"""
+    try:
+        image = normalize_image(file.file)
+        return dhash(image), image
+    finally:
+        file.file.seek(0)
+
+async def _analyze_uploads(image_processor, images, content_hashes=None):
+    """Merged analysis of every uploaded photo, or None if there is nothing usable"""
+    if not images:
+        return None
+    analysis = await image_processor.analyze_products(images, content_hashes)
+    if analysis.get("status") != "success":
+        logger.warning(f"Image analysis failed: {analysis.get('message')}")
+        return None
+    return analysis
+
 # Search for products by title across different categories.
-async def search_products(title: str):
-    from main import db
-    search_term = title.lower()
+async def search_products(title: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    from main import product_search
     results = []
 
     try:
-        products_cursor = db["products"].find({"title": {"$regex": search_term, "$options": "i"}})
+        # Ranked lookup against the in-process title index
+        products, next_cursor = await product_search.find_page(
+            title, limit, after, projection_for(Product))
 
-        async for product in products_cursor:
+        for product in products:
             product["id"] = str(product["_id"])  # Convert _id to id
 
             try:
@@ -116,17 +179,19 @@ async def search_products(title: str):
             )
             ]
 
-        return {"status": "success", "products": results}
+        return {"status": "success", "products": results, "next_cursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error during search: {e}")
         raise HTTPException(status_code=500, detail=f"Error during search: {e}")
 
 # Get all listings for a specific product.
-async def get_product_listings(product_id: str):
+async def get_product_listings(product_id: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
     from main import db
-    listings_cursor = db["listings"].find({"product_id": product_id})
-    listings = await listings_cursor.to_list(length=None)
+    listings, next_cursor = await fetch_page(
+        db["listings"], {"product_id": product_id}, ProductListing, limit, after)
 
     if listings:
         # Convert ObjectId to string for JSON compatibility
@@ -135,7 +200,8 @@ async def get_product_listings(product_id: str):
 
         return {
             "status": "success",
-            "listings": [ProductListing(**listing) for listing in listings]  # Convert to Pydantic model
+            "listings": [ProductListing(**listing) for listing in listings],  # Convert to Pydantic model
+            "next_cursor": next_cursor
         }
 
     # Fallback generic listing
@@ -154,7 +220,8 @@ async def get_product_listings(product_id: str):
 
     return {
         "status": "success",
-        "listings": [default_listing.model_dump()]  # Convert Pydantic model to dict
+        "listings": [default_listing.model_dump()],  # Convert Pydantic model to dict
+        "next_cursor": None
     }
 
 # Get comparable products for comparison.
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi import UploadFile
+from job_queue import UPLOAD_DIR, MAX_UPLOAD_BYTES
+from upload_ingest import read_upload_form
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _serialize_job(job):
+    job = dict(job)
+    job["id"] = str(job.pop("_id"))
+    return job
+
+def _save_upload(file: UploadFile):
+    """Move an upload spooled into UPLOAD_DIR to its final name; a rename, not a second copy"""
+    suffix = Path(file.filename or "").suffix.lower()
+    if not suffix[1:].isalnum():
+        suffix = ".mp4"
+    path = UPLOAD_DIR / f"{uuid.uuid4().hex}{suffix}"
+    file.file.close()
+    os.replace(file.file.name, path)
+    return path
+
+def _discard_upload(file: UploadFile):
+    try:
+        os.unlink(file.file.name)
+    except FileNotFoundError:
+        pass
+
+# Queue a video URL or upload for background processing.
+async def submit_video_job(request: Request):
+    from main import video_jobs
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # Streamed with the size limit enforced as the body arrives, not after it is all on disk
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        fields, files = await read_upload_form(request, file_fields=("file",), max_files=1,
+                                               max_file_bytes=MAX_UPLOAD_BYTES,
+                                               too_many_files="Upload one video file at a time",
+                                               spool_dir=UPLOAD_DIR)
+    else:
+        fields, files = dict(await request.form()), []
+    file = files[0] if files else None
+    url = fields.get("url")
+    try:
+        if (file is None) == (not url):
+            raise HTTPException(status_code=400, detail="Provide either a video file or a video URL")
+
+        if file is not None:
+            path = await asyncio.to_thread(_save_upload, file)
+            job_id = await video_jobs.submit("upload", str(path))
+        else:
+            job_id = await video_jobs.submit("url", url)
+    finally:
+        if file is not None:
+            await file.close()
+            # Left behind only when the upload was not queued
+            await asyncio.to_thread(_discard_upload, file)
+
+    return {
+        "status": "success",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }
+
+# Get the current state of a video job.
+async def get_video_job(job_id: str):
+    from main import video_jobs
+    job = await video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "status": "success",
+        "job": _serialize_job(job)
+    }
+
+# Stream a video job's status changes as server-sent events.
+async def stream_video_job(job_id: str):
+    from main import video_jobs
+    if await video_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in video_jobs.events(job_id):
+            yield f"event: {job['status']}\ndata: {json.dumps(_serialize_job(job), default=str)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
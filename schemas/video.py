@@ -8,6 +8,7 @@ from fastapi import File, UploadFile, Form
 from video_data import VIDEO_DATABASE
 from datetime import datetime
 from schemas.image import get_categories
+from pagination import DEFAULT_PAGE_SIZE, projection_for
     
 router = APIRouter()
 
@@ -212,15 +213,15 @@ async def upload_video(
         }
 
 # Search for product videos by title.
-async def search_videos(title: str):
-    from main import db
+async def search_videos(title: str, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    from main import video_search
     results = []
-    search_term = title.lower()
     
-    # Fetching videos from the database
-    video_cursor = db["videos"].find({"title": {"$regex": search_term, "$options": "i"}})
+    # Ranked lookup against the in-process title index
+    videos, next_cursor = await video_search.find_page(
+        title, limit, after, projection_for(Video))
     
-    async for video in video_cursor:
+    for video in videos:
         video["id"] = str(video["_id"])  # Convert ObjectId to string
 
         try:
@@ -246,7 +247,8 @@ async def search_videos(title: str):
         
     return {
         "status": "success",
-        "videos": results
+        "videos": results,
+        "next_cursor": next_cursor
     }
 
 # Get all listings and platforms for a specific video.
@@ -0,0 +1,188 @@
+import asyncio
+import bisect
+import logging
+import math
+import os
+import re
+from datetime import datetime
+from time import perf_counter
+from pymongo.errors import PyMongoError
+from pagination import page_ranked
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+REFRESH_INTERVAL_SECONDS = int(os.getenv("SEARCH_REFRESH_SECONDS", "300"))
+# Cap on how many indexed terms a single prefix may expand to
+MAX_PREFIX_EXPANSIONS = 64
+PREFIX_MATCH_WEIGHT = 0.5
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str):
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self, collection, fields, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        """
+        In-process inverted index with BM25 ranking and prefix matching
+        :param collection: Motor collection to index
+        :param fields: Document fields whose text is indexed
+        :param refresh_interval: Seconds between background rebuilds
+        """
+        self.collection = collection
+        self.fields = fields
+        self.refresh_interval = refresh_interval
+        self._postings = {}
+        self._terms = []
+        self._doc_lengths = {}
+        self._average_length = 0.0
+        self._build_lock = asyncio.Lock()
+        self._first_build = None
+        self.ready = False
+        self.build_seconds = 0.0
+        self.last_built_at = None
+
+    def _document_text(self, document):
+        parts = []
+        for field in self.fields:
+            value = document.get(field)
+            if isinstance(value, (list, tuple)):
+                parts.extend(str(v) for v in value)
+            elif value is not None:
+                parts.append(str(value))
+        return " ".join(parts)
+
+    def _index_document(self, postings, doc_lengths, document):
+        tokens = tokenize(self._document_text(document))
+        doc_id = document["_id"]
+        doc_lengths[doc_id] = len(tokens)
+        for token in tokens:
+            term_postings = postings.setdefault(token, {})
+            term_postings[doc_id] = term_postings.get(doc_id, 0) + 1
+
+    async def build(self):
+        """Rebuild the index from the collection"""
+        async with self._build_lock:
+            start = perf_counter()
+            postings, doc_lengths = {}, {}
+            projection = {field: 1 for field in self.fields}
+            async for document in self.collection.find({}, projection):
+                self._index_document(postings, doc_lengths, document)
+
+            self._postings = postings
+            self._doc_lengths = doc_lengths
+            self._terms = sorted(postings)
+            self._average_length = (sum(doc_lengths.values()) / len(doc_lengths)) if doc_lengths else 0.0
+            self.ready = True
+            self.build_seconds = round(perf_counter() - start, 4)
+            self.last_built_at = datetime.utcnow().isoformat()
+            logger.info(f"Search index on {self.collection.name} built: "
+                        f"{len(doc_lengths)} documents in {self.build_seconds}s")
+
+    async def ensure_built(self):
+        """Build on first use; concurrent callers share one build, which outlives a cancelled caller"""
+        if self.ready:
+            return
+        if self._first_build is None or self._first_build.done():
+            self._first_build = asyncio.ensure_future(self.build())
+        await asyncio.shield(self._first_build)
+
+    def _expand(self, token):
+        """Return (term, weight) pairs for an exact match plus prefix completions"""
+        expansions = []
+        if token in self._postings:
+            expansions.append((token, 1.0))
+        position = bisect.bisect_left(self._terms, token)
+        while position < len(self._terms) and len(expansions) < MAX_PREFIX_EXPANSIONS:
+            term = self._terms[position]
+            if not term.startswith(token):
+                break
+            if term != token:
+                expansions.append((term, PREFIX_MATCH_WEIGHT))
+            position += 1
+        return expansions
+
+    def search(self, query: str):
+        """Return [(doc_id, score)] for documents matching every query token, best first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        total_docs = len(self._doc_lengths)
+        scores = None
+        for token in dict.fromkeys(tokens):
+            token_scores = {}
+            for term, weight in self._expand(token):
+                term_postings = self._postings[term]
+                idf = math.log(1 + (total_docs - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+                for doc_id, frequency in term_postings.items():
+                    length_norm = 1 - B + B * self._doc_lengths[doc_id] / (self._average_length or 1)
+                    score = weight * idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+
+            # Every query token has to match, like the substring search it replaces
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + s for doc_id, s in token_scores.items() if doc_id in scores}
+            if not scores:
+                return []
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    async def _fetch(self, ranked, projection=None):
+        """Load ranked documents by _id, keeping rank order and adding a `score` field"""
+        if not ranked:
+            return []
+
+        ids = [doc_id for doc_id, _ in ranked]
+        documents = {}
+        async for document in self.collection.find({"_id": {"$in": ids}}, projection):
+            documents[document["_id"]] = document
+
+        results = []
+        for doc_id, score in ranked:
+            document = documents.get(doc_id)
+            if document is not None:
+                document["score"] = round(score, 4)
+                results.append(document)
+        return results
+
+    async def find(self, query: str, limit: int = None, projection: dict = None):
+        """Return matching documents in rank order"""
+        await self.ensure_built()
+        ranked = self.search(query)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return await self._fetch(ranked, projection)
+
+    async def find_page(self, query: str, limit: int = None, after: str = None, projection: dict = None):
+        """Return one page of matching documents in rank order and the cursor of the next page"""
+        await self.ensure_built()
+        page, next_cursor = page_ranked(self.search(query), limit, after)
+        return await self._fetch(page, projection), next_cursor
+
+    async def run(self):
+        """Rebuild the index periodically"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.build()
+            except PyMongoError as e:
+                logger.error(f"Error rebuilding search index on {self.collection.name}: {e}")
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "documents": len(self._doc_lengths),
+            "terms": len(self._terms),
+            "build_seconds": self.build_seconds,
+            "last_built_at": self.last_built_at,
+        }
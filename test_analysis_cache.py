@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+from analysis_cache import AnalysisCache
+from image_processor import ImageProcessor, PROMPT_VERSION
+
+ANALYSIS_TEXT = """BEGIN_ANALYSIS
+Product Name: Sony WH-1000XM4
+Category: Electronics
+Subcategory: Headphones
+Key Features:
+- Noise cancelling
+END_ANALYSIS"""
+
+@pytest.mark.asyncio
+async def test_same_pixels_share_key():
+    cache = AnalysisCache(prompt_version=PROMPT_VERSION)
+    first = await cache.key_for(Image.new('RGB', (32, 32), 'red'))
+    second = await cache.key_for(Image.new('RGBA', (32, 32), 'red'))
+    other = await cache.key_for(Image.new('RGB', (32, 32), 'blue'))
+    assert first == second
+    assert first != other
+    assert first.startswith(PROMPT_VERSION)
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_counters():
+    cache = AnalysisCache(max_entries=2)
+    await cache.set('a', {'product_name': 'A'})
+    await cache.set('b', {'product_name': 'B'})
+    await cache.set('c', {'product_name': 'C'})
+    assert await cache.get('a') is None
+    assert (await cache.get('c'))['product_name'] == 'C'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses():
+    cache = AnalysisCache(ttl_seconds=-1)
+    await cache.set('a', {'product_name': 'A'})
+    assert await cache.get('a') is None
+
+@pytest.mark.asyncio
+async def test_analyze_product_hits_cache():
+    processor = ImageProcessor(cache=AnalysisCache(prompt_version=PROMPT_VERSION))
+    image = Image.new('RGB', (16, 16), 'white')
+    with patch('google.generativeai.GenerativeModel.generate_content_async', new_callable=AsyncMock) as mock_generate:
+        mock_generate.return_value.text = ANALYSIS_TEXT
+        first = await processor.analyze_product(image)
+        second = await processor.analyze_product(image)
+    assert mock_generate.await_count == 1
+    assert first == second
+    assert second['product_name'] == 'Sony WH-1000XM4'
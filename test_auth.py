@@ -0,0 +1,48 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from auth import KeyRing, TokenVerifier
+
+def _write_keys(path, active, keys):
+    path.write_text(json.dumps({"active": active, "keys": keys}))
+
+def _payload(minutes=5):
+    return {"sub": "alice", "exp": datetime.utcnow() + timedelta(minutes=minutes)}
+
+def test_verified_tokens_are_cached(tmp_path):
+    secrets = tmp_path / "keys.json"
+    _write_keys(secrets, "k1", {"k1": "first-secret"})
+    verifier = TokenVerifier(KeyRing(str(secrets)))
+    token = verifier.create_token(_payload())
+    assert verifier.verify(token)["sub"] == "alice"
+    assert verifier.verify(token)["sub"] == "alice"
+    assert verifier.stats()["hits"] == 1
+
+def test_key_rotation_without_restart(tmp_path):
+    secrets = tmp_path / "keys.json"
+    _write_keys(secrets, "k1", {"k1": "first-secret"})
+    keyring = KeyRing(str(secrets))
+    verifier = TokenVerifier(keyring)
+    old_token = verifier.create_token(_payload())
+
+    _write_keys(secrets, "k2", {"k1": "first-secret", "k2": "second-secret"})
+    keyring._mtime = None
+    keyring.refresh(force=True)
+    new_token = verifier.create_token(_payload())
+    assert verifier.verify(old_token)["sub"] == "alice"
+    assert verifier.verify(new_token)["sub"] == "alice"
+
+    _write_keys(secrets, "k2", {"k2": "second-secret"})
+    keyring._mtime = None
+    keyring.refresh(force=True)
+    with pytest.raises(HTTPException):
+        verifier.verify(old_token)
+
+def test_expired_and_tampered_tokens_are_rejected(tmp_path):
+    verifier = TokenVerifier(KeyRing(None))
+    with pytest.raises(HTTPException):
+        verifier.verify(verifier.create_token(_payload(minutes=-1)))
+    header, payload, signature = verifier.create_token(_payload()).split(".")
+    with pytest.raises(HTTPException):
+        verifier.verify(".".join([header, payload[:-2] + "xx", signature]))
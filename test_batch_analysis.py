@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from PIL import Image
+import image_processor
+from image_processor import ImageProcessor, BATCH_ANALYSIS_PROMPT
+from analysis_cache import AnalysisCache
+
+RESPONSE = """BEGIN_ANALYSIS
+Product Name: Trail Runner 2
+Category: Fashion
+Subcategory: Shoes
+Description: A lightweight trail shoe.
+Price: $120
+Key Features:
+- Grippy outsole
+Search Keywords:
+- trail shoe
+END_ANALYSIS"""
+
+def _images(count):
+    return [Image.new("RGB", (8, 8), (i * 40, 0, 0)) for i in range(count)]
+
+@pytest.mark.asyncio
+async def test_photos_of_one_product_share_one_request():
+    processor = ImageProcessor(cache=AnalysisCache(prompt_version="v"))
+    processor.model = Mock(generate_content=AsyncMock(return_value=Mock(text=RESPONSE)))
+    images = _images(3)
+
+    analysis = await processor.analyze_products(images)
+    assert analysis["status"] == "success"
+    assert analysis["product_name"] == "Trail Runner 2"
+    assert analysis["images_analyzed"] == 3
+    processor.model.generate_content.assert_awaited_once()
+    prompt, *parts = processor.model.generate_content.await_args.args[0]
+    assert prompt == BATCH_ANALYSIS_PROMPT
+    assert [part["mime_type"] for part in parts] == ["image/jpeg"] * 3
+
+    # The same set of photos is answered from the cache
+    await processor.analyze_products(list(reversed(images)))
+    assert processor.model.generate_content.await_count == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_mode_merges_per_image_results():
+    processor = ImageProcessor()
+    results = [
+        {"status": "success", "product_name": "Trail Runner 2", "category": "Fashion", "subcategory": "",
+         "description": "A trail shoe.", "price": "", "key_features": ["Grippy outsole"], "search_keywords": ["trail"]},
+        {"status": "success", "product_name": "Trail Runner 2", "category": "Fashion", "subcategory": "Shoes",
+         "description": "Side view.", "price": "$120", "key_features": ["grippy outsole", "Light"], "search_keywords": []},
+        {"status": "error", "message": "quota"},
+    ]
+    with patch.object(image_processor, "BATCH_MODE", "concurrent"), \
+         patch.object(ImageProcessor, "analyze_product", AsyncMock(side_effect=results)):
+        analysis = await processor.analyze_products(_images(3))
+
+    assert analysis["subcategory"] == "Shoes"
+    assert analysis["price"] == "$120"
+    assert analysis["key_features"] == ["Grippy outsole", "Light"]
+
+@pytest.mark.asyncio
+async def test_upload_errors_keep_their_status():
+    from fastapi import HTTPException
+    from schemas.image import upload_image
+    files = [Mock(filename=f"{i}.jpg") for i in range(6)]
+    with pytest.raises(HTTPException) as error:
+        await upload_image(files, title="Trail Runner")
+    assert error.value.status_code == 400
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from schemas.combined import search_all_content
+
+class FakeIndex:
+    def __init__(self, documents, delay=0.0, build_delay=0.0):
+        self.documents = documents
+        self.delay = delay
+        self.build_delay = build_delay
+        self.builds = 0
+
+    async def ensure_built(self):
+        if not self.builds:
+            await asyncio.sleep(self.build_delay)
+            self.builds += 1
+
+    async def find_page(self, query, limit, after, projection):
+        await asyncio.sleep(self.delay)
+        return [dict(d) for d in self.documents[:limit]], None
+
+def _sources(products, videos):
+    return patch("schemas.combined._search_sources",
+                 return_value={"products": (products, None), "videos": (videos, None)})
+
+@pytest.fixture(autouse=True)
+def fast_timeout():
+    with patch("schemas.combined.SOURCE_TIMEOUT", 0.05), patch("schemas.combined.projection_for"):
+        yield
+
+@pytest.mark.asyncio
+async def test_sources_are_merged_by_score():
+    products = FakeIndex([{"_id": "p1", "score": 1.0}])
+    videos = FakeIndex([{"_id": "v1", "score": 2.0}])
+    with _sources(products, videos):
+        response = await search_all_content("lamp", limit=5)
+
+    assert [item["id"] for item in response["ranked"]] == ["v1", "p1"]
+    assert response["partial"] is False
+
+@pytest.mark.asyncio
+async def test_slow_source_is_left_out():
+    products = FakeIndex([{"_id": "p1", "score": 1.0}])
+    videos = FakeIndex([{"_id": "v1", "score": 2.0}], delay=1.0)
+    with _sources(products, videos):
+        response = await search_all_content("lamp", limit=5)
+
+    assert response["partial"] is True
+    assert response["unavailable_sources"] == ["videos"]
+    assert response["results"]["videos"] == []
+    assert [item["id"] for item in response["ranked"]] == ["p1"]
+
+@pytest.mark.asyncio
+async def test_partial_results_can_be_refused():
+    products = FakeIndex([{"_id": "p1", "score": 1.0}])
+    videos = FakeIndex([], delay=1.0)
+    with _sources(products, videos), pytest.raises(HTTPException) as error:
+        await search_all_content("lamp", limit=5, partial=False)
+    assert error.value.status_code == 500
+
+@pytest.mark.asyncio
+async def test_cold_build_is_not_cut_off_by_the_timeout():
+    products = FakeIndex([{"_id": "p1", "score": 1.0}], build_delay=0.1)
+    videos = FakeIndex([{"_id": "v1", "score": 2.0}])
+    with _sources(products, videos):
+        response = await search_all_content("lamp", limit=5)
+
+    assert products.builds == 1
+    assert response["partial"] is False
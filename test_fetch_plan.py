@@ -0,0 +1,30 @@
+from fetch_plan import choose_formats, plan_fetch, stream_urls
+
+FORMATS = [
+    {"format_id": "18", "vcodec": "avc1", "acodec": "mp4a", "height": 360, "tbr": 500, "url": "u18"},
+    {"format_id": "22", "vcodec": "avc1", "acodec": "mp4a", "height": 720, "tbr": 1500, "url": "u22"},
+    {"format_id": "135", "vcodec": "avc1", "acodec": "none", "height": 480, "tbr": 800, "url": "u135"},
+    {"format_id": "136", "vcodec": "avc1", "acodec": "none", "height": 720, "tbr": 1600, "url": "u136"},
+    {"format_id": "137", "vcodec": "avc1", "acodec": "none", "height": 1080, "tbr": 4000, "url": "u137"},
+    {"format_id": "139", "vcodec": "none", "acodec": "mp4a", "abr": 48, "url": "u139"},
+    {"format_id": "140", "vcodec": "none", "acodec": "mp4a", "abr": 128, "url": "u140"},
+]
+
+def test_smallest_video_meeting_target_plus_lowest_bitrate_audio():
+    video, audio = choose_formats(FORMATS, target_height=480)
+    assert (video["format_id"], audio["format_id"]) == ("135", "139")
+
+def test_without_ffmpeg_a_single_combined_file_is_chosen():
+    video, audio = choose_formats(FORMATS, target_height=480, can_merge=False)
+    assert video["format_id"] == "22" and audio is None
+
+def test_partial_download_when_only_the_start_is_analyzed():
+    info = {"id": "abc", "duration": 3600, "formats": FORMATS}
+    plan = plan_fetch(info, target_height=480, max_seconds=300, ffmpeg_path="/usr/bin/ffmpeg")
+    assert plan["format"] == "135+139"
+    assert "download_ranges" in plan
+    assert "download_ranges" not in plan_fetch({**info, "duration": 120}, 480, 300, "/usr/bin/ffmpeg")
+
+def test_unknown_formats_fall_back_to_best():
+    assert plan_fetch({"formats": []}) == {"format": "best"}
+    assert stream_urls({"formats": FORMATS}, target_height=480) == ("u135", "u139")
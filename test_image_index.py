@@ -0,0 +1,65 @@
+import random
+from PIL import Image, ImageDraw
+from image_index import NearDuplicateIndex, dhash, hamming_distance
+
+def _sample_image(size=(256, 256)):
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([40, 60, 180, 200], fill='navy')
+    draw.ellipse([120, 20, 240, 140], fill='orange')
+    return image
+
+def test_dhash_survives_resize():
+    original = _sample_image()
+    resized = original.resize((97, 97))
+    assert hamming_distance(dhash(original), dhash(resized)) <= 6
+
+def test_lookup_finds_nearest_within_distance():
+    index = NearDuplicateIndex(max_distance=6, chunks=4)
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    for i, image_hash in enumerate(hashes):
+        index.add(image_hash, listing=i)
+
+    target = hashes[42]
+    for bit in rng.sample(range(64), 5):
+        target ^= 1 << bit
+    payload, distance = index.lookup(target)
+    assert payload == {'listing': 42}
+    assert distance == 5
+
+def test_lookup_misses_beyond_distance():
+    index = NearDuplicateIndex(max_distance=6, chunks=4)
+    index.add(0, listing='a')
+    assert index.lookup((1 << 7) - 1) is None
+
+def test_add_merges_payload():
+    index = NearDuplicateIndex()
+    index.add(123, analysis={'product_name': 'Lamp'})
+    index.add(123, listings=['l1'])
+    payload, distance = index.lookup(123)
+    assert distance == 0
+    assert payload == {'analysis': {'product_name': 'Lamp'}, 'listings': ['l1']}
+    assert len(index) == 1
+
+def test_least_recently_used_hashes_are_evicted():
+    a, b, c = 0, (1 << 64) - 1, 0x5555555555555555  # Far apart, so lookups only match exactly
+    index = NearDuplicateIndex(max_entries=2)
+    index.add(a, listing='a')
+    index.add(b, listing='b')
+    index.lookup(a)  # Using 'a' makes 'b' the oldest
+    index.add(c, listing='c')
+    assert len(index) == 2
+    assert index.lookup(b) is None
+    assert index.lookup(a)[0] == {'listing': 'a'}
+    assert index.stats()['evictions'] == 1
+
+def test_eviction_from_shared_buckets():
+    # Plain backgrounds give many hashes with identical chunks; they all share buckets
+    index = NearDuplicateIndex(max_entries=100)
+    hashes = [i << 48 for i in range(300)]
+    for image_hash in hashes:
+        index.add(image_hash, listing=image_hash)
+    assert len(index) == 100
+    assert sum(len(bucket) for table in index._tables for bucket in table.values()) == 100 * index.chunks
+    assert index.lookup(hashes[-1])[1] == 0
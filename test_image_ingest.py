@@ -0,0 +1,37 @@
+import io
+import pytest
+from pathlib import Path
+from PIL import Image
+from image_ingest import normalize_image, encode_image, ingest_image
+
+def _encoded(image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    buffer.seek(0)
+    return buffer
+
+def test_large_jpeg_is_downscaled_and_upright():
+    photo = Image.new("RGB", (4000, 3000), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    image = normalize_image(_encoded(photo, "JPEG", exif=exif), max_side=1024)
+    assert image.mode == "RGB"
+    assert image.size == (768, 1024)
+
+def test_transparency_is_flattened_onto_white():
+    logo = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+    image = normalize_image(_encoded(logo, "PNG"))
+    assert image.mode == "RGB"
+    assert image.getpixel((0, 0)) == (255, 255, 255)
+
+@pytest.mark.asyncio
+async def test_ingested_image_encodes_to_compact_jpeg():
+    image = await ingest_image(_encoded(Image.new("RGB", (3000, 2000), (10, 120, 10)), "PNG"), max_side=512)
+    blob = encode_image(image)
+    assert blob["mime_type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(blob["data"])).size == (512, 341)
+
+def test_avif_upload_decodes():
+    image = normalize_image(Path(__file__).parent / "static/beauty/mascara.avif", max_side=256)
+    assert image.mode == "RGB"
+    assert max(image.size) <= 256
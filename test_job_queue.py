@@ -0,0 +1,119 @@
+import asyncio
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import job_queue
+from job_queue import VideoJobQueue
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document):
+        self.documents[document["_id"]] = dict(document)
+
+    async def update_one(self, query, update):
+        self.documents[query["_id"]].update(update["$set"])
+
+    async def find_one(self, query):
+        document = self.documents.get(query["_id"])
+        return dict(document) if document else None
+
+    def _matches(self, document, query):
+        return (document["status"] in query["status"]["$in"]
+                and document["heartbeat_at"] < query["heartbeat_at"]["$lt"]
+                and query.get("_id", document["_id"]) == document["_id"])
+
+    async def find(self, query, projection=None):
+        for document in list(self.documents.values()):
+            if self._matches(document, query):
+                yield dict(document)
+
+    async def find_one_and_update(self, query, update):
+        document = self.documents.get(query["_id"])
+        if document is None or not self._matches(document, query):
+            return None
+        before = dict(document)
+        document.update(update["$set"])
+        return before
+
+def _crash(*args):
+    os._exit(1)
+
+def _succeed(*args):
+    return {"status": "success"}
+
+@pytest.fixture
+def queue():
+    queue = VideoJobQueue(FakeCollection(), max_workers=1)
+    # Run jobs in a thread so the test does not spawn processes
+    queue._executor = ThreadPoolExecutor(max_workers=1)
+    yield queue
+    queue.shutdown()
+
+@pytest.mark.asyncio
+async def test_job_result_is_persisted_and_streamed(queue):
+    result = {"status": "success", "final_description": "A red kettle"}
+    with patch("job_queue._run_video_job", return_value=result) as run:
+        job_id = await queue.submit("url", "https://example.com/video")
+        statuses = [job["status"] async for job in queue.events(job_id)]
+
+    run.assert_called_once_with(None, job_id, "url", "https://example.com/video")
+    assert statuses[-1] == "completed"
+    job = await queue.get(job_id)
+    assert job["result"] == result
+
+@pytest.mark.asyncio
+async def test_failed_pipeline_marks_job_failed(queue):
+    with patch("job_queue._run_video_job", return_value={"status": "error", "message": "Failed to download video"}):
+        job_id = await queue.submit("url", "https://example.com/missing")
+        async for job in queue.events(job_id):
+            pass
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Failed to download video"
+
+@pytest.mark.asyncio
+async def test_jobs_orphaned_by_a_stopped_process_are_requeued(queue):
+    stale = (datetime.utcnow() - timedelta(seconds=job_queue.STALE_JOB_SECONDS + 60)).isoformat()
+    fresh = datetime.utcnow().isoformat()
+    for job_id, heartbeat in (("orphan", stale), ("alive", fresh)):
+        await queue.collection.insert_one({"_id": job_id, "kind": "url", "source": f"https://example.com/{job_id}",
+                                           "status": "running", "heartbeat_at": heartbeat})
+
+    with patch("job_queue._run_video_job", return_value={"status": "success"}) as run:
+        await queue.recover()
+        await asyncio.gather(*queue._tasks.values())
+
+    run.assert_called_once_with(None, "orphan", "url", "https://example.com/orphan")
+    assert queue.collection.documents["orphan"]["status"] == "completed"
+    assert queue.collection.documents["alive"]["status"] == "running"
+    assert queue.recovered == 1
+
+def test_worker_reuses_one_event_loop_across_jobs():
+    loops = []
+
+    class Processor:
+        async def process_video(self, url):
+            loops.append(asyncio.get_running_loop())
+            return {"status": "success"}
+
+    with patch("job_queue._worker_processor", Processor()), patch("job_queue._worker_loop", None):
+        job_queue._run_video_job(None, "a", "url", "https://example.com/a")
+        job_queue._run_video_job(None, "b", "url", "https://example.com/b")
+
+    assert loops[0] is loops[1]
+
+@pytest.mark.asyncio
+async def test_crashed_worker_does_not_break_later_jobs():
+    queue = VideoJobQueue(FakeCollection(), max_workers=1)
+    try:
+        for run, expected in ((_crash, "failed"), (_succeed, "completed")):
+            with patch("job_queue._run_video_job", run):
+                job_id = await queue.submit("url", "https://example.com/video")
+                await asyncio.gather(*queue._tasks.values())
+            assert queue.collection.documents[job_id]["status"] == expected
+    finally:
+        queue.shutdown()
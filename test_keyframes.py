@@ -0,0 +1,28 @@
+from PIL import Image, ImageDraw
+from keyframes import select_keyframes
+
+def _shot(color, shape_color=None):
+    image = Image.new('RGB', (320, 180), color)
+    if shape_color:
+        ImageDraw.Draw(image).rectangle([100, 40, 220, 140], fill=shape_color)
+    return image
+
+def test_picks_one_frame_per_scene():
+    frames = (
+        [_shot('white', 'red') for _ in range(6)]
+        + [_shot('navy', 'yellow') for _ in range(6)]
+        + [_shot('green', 'black') for _ in range(6)]
+    )
+    selected = select_keyframes(frames, 3)
+    colors = {frame.getpixel((5, 5)) for frame in selected}
+    assert colors == {(255, 255, 255), (0, 0, 128), (0, 128, 0)}
+
+def test_skips_blank_frames_and_keeps_order():
+    black = _shot('black')
+    first, second = _shot('white', 'red'), _shot('navy', 'yellow')
+    frames = [black, first, black, black, second, black]
+    assert select_keyframes(frames, 2) == [first, second]
+
+def test_returns_all_frames_when_few_candidates():
+    frames = [_shot('white'), _shot('black')]
+    assert select_keyframes(frames, 3) == frames
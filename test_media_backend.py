@@ -0,0 +1,47 @@
+import numpy as np
+from unittest.mock import patch
+import media_backend
+from media_backend import resolve_ffmpeg, OpenCVBackend
+
+def test_configured_ffmpeg_path_wins(tmp_path, monkeypatch):
+    binary = tmp_path / "ffmpeg"
+    binary.touch()
+    monkeypatch.setenv("FFMPEG_PATH", str(binary))
+    with patch("shutil.which", return_value="/usr/bin/ffmpeg"):
+        assert resolve_ffmpeg() == str(binary)
+
+def test_falls_back_to_path_then_bundled_binary(monkeypatch):
+    monkeypatch.setenv("FFMPEG_PATH", "/missing/ffmpeg")
+    with patch("shutil.which", return_value="/usr/bin/ffmpeg"):
+        assert resolve_ffmpeg() == "/usr/bin/ffmpeg"
+    with patch("shutil.which", return_value=None), patch.object(media_backend, "imageio_ffmpeg", None):
+        assert resolve_ffmpeg() is None
+
+def test_audio_backend_skips_unavailable_backends(monkeypatch):
+    monkeypatch.setattr(media_backend, "AUDIO_BACKENDS", ["pyav", "ffmpeg"])
+    monkeypatch.setattr(media_backend, "av", None)
+    with patch("media_backend.resolve_ffmpeg", return_value="/usr/bin/ffmpeg"), \
+            patch("media_backend.probe_ffmpeg", return_value={"decoders": {"aac"}}):
+        backend = media_backend.audio_backend()
+    assert backend.name == "ffmpeg"
+    assert backend.audio_command("clip.mp4", 16000)[-3:] == ["-f", "f32le", "pipe:1"]
+
+def test_backends_are_chosen_by_capability(monkeypatch):
+    # ffmpeg only decodes audio here, and a binary that fails its probe is not used at all
+    monkeypatch.setattr(media_backend, "FRAME_BACKENDS", ["ffmpeg", "opencv"])
+    monkeypatch.setattr(media_backend, "AUDIO_BACKENDS", ["ffmpeg"])
+    with patch("media_backend.resolve_ffmpeg", return_value="/usr/bin/ffmpeg"), \
+            patch("media_backend.probe_ffmpeg", side_effect=OSError("exec format error")):
+        assert media_backend.frame_backend().name == "opencv"
+        assert media_backend.audio_backend() is None
+
+def test_opencv_frames_are_downscaled_rgb():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[..., 0] = 255  # Blue in OpenCV's BGR order
+    with patch("cv2.VideoCapture") as mock_cap:
+        mock_cap.return_value.get.return_value = 10
+        mock_cap.return_value.grab.return_value = True
+        mock_cap.return_value.retrieve.return_value = (True, frame)
+        frames = OpenCVBackend().sample_frames("clip.mp4", 2, 768)
+    assert [f.size for f in frames] == [(768, 432)] * 2
+    assert frames[0].getpixel((0, 0)) == (0, 0, 255)
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import pytest
+from media_cache import MediaCache, url_digest
+
+def test_url_digest_is_stable():
+    assert url_digest("https://example.com/v") == url_digest(" https://example.com/v ")
+    assert url_digest("https://example.com/v") != url_digest("https://example.com/w")
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_share_one_download(tmp_path):
+    cache = MediaCache(tmp_path)
+    calls = 0
+
+    async def download(url, destination):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        destination.write_bytes(b"video")
+        return True
+
+    paths = await asyncio.gather(*(cache.fetch("https://example.com/v", download) for _ in range(3)))
+    assert calls == 1
+    assert len(set(paths)) == 1 and paths[0].read_bytes() == b"video"
+    assert cache.stats()["shared_downloads"] == 2
+
+@pytest.mark.asyncio
+async def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = MediaCache(tmp_path, max_bytes=10)
+
+    async def download(url, destination):
+        destination.write_bytes(b"x" * 4)
+        return True
+
+    first = await cache.fetch("https://example.com/1", download)
+    second = await cache.fetch("https://example.com/2", download)
+    for path in (first, second):
+        cache.release(path)
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    cache.lookup("https://example.com/1")  # Using the first makes the second the oldest
+
+    third = await cache.fetch("https://example.com/3", download)
+    assert first.exists() and third.exists()
+    assert not second.exists()
+
+def test_fetch_settings_change_the_cache_key(tmp_path):
+    low, full = MediaCache(tmp_path, variant="480p-0s"), MediaCache(tmp_path, variant="480p-30s")
+    assert low.path_for("https://example.com/v") != full.path_for("https://example.com/v")
+
+@pytest.mark.asyncio
+async def test_files_pinned_by_another_process_are_not_evicted(tmp_path):
+    async def download(url, destination):
+        destination.write_bytes(b"x" * 4)
+        return True
+
+    # A second cache on the same directory stands in for another worker process
+    other = MediaCache(tmp_path)
+    pinned = await other.fetch("https://example.com/1", download)
+    os.utime(pinned, (1, 1))
+
+    cache = MediaCache(tmp_path, max_bytes=4)
+    await cache.fetch("https://example.com/2", download)
+    assert pinned.exists()
+
+    other.release(pinned)
+    await cache.fetch("https://example.com/3", download)
+    assert not pinned.exists()
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_a_cancelled_download(tmp_path):
+    cache = MediaCache(tmp_path)
+    started = asyncio.Event()
+
+    async def stalled(url, destination):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def download(url, destination):
+        destination.write_bytes(b"video")
+        return True
+
+    owner = asyncio.create_task(cache.fetch("https://example.com/v", stalled))
+    await started.wait()
+    waiter = asyncio.create_task(cache.fetch("https://example.com/v", download))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    path = await asyncio.wait_for(waiter, timeout=5)
+    assert path.read_bytes() == b"video"
+
+@pytest.mark.asyncio
+async def test_download_larger_than_the_cache_is_kept_until_released(tmp_path):
+    cache = MediaCache(tmp_path, max_bytes=2)
+
+    async def download(url, destination):
+        destination.write_bytes(b"x" * 4)
+        return True
+
+    path = await cache.fetch("https://example.com/big", download)
+    assert path.exists()
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi import HTTPException
+from password_hasher import PasswordHasher, PasswordHasherBusy, hash_rounds, _hash_password
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=1)
+    # Hash in a thread so the test does not spawn processes
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+    yield hasher
+    hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_full_queue_raises_busy(hasher):
+    started = asyncio.Event()
+
+    def slow_hash(password, rounds):
+        loop.call_soon_threadsafe(started.set)
+        return _hash_password(password, 10)
+
+    loop = asyncio.get_running_loop()
+    with patch("password_hasher.QUEUE_TIMEOUT", 0.05), patch("password_hasher._hash_password", slow_hash):
+        first = asyncio.create_task(hasher.hash("correct horse"))
+        await started.wait()
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.hash("battery staple")
+        await first
+
+@pytest.mark.asyncio
+async def test_busy_hasher_returns_503():
+    import main
+    from schemas.user_schema import UserSignup
+    users = Mock(find_one=AsyncMock(return_value=None), insert_one=AsyncMock())
+    busy = AsyncMock(side_effect=PasswordHasherBusy("Password hashing queue is full"))
+    with patch("main.users_collection", users), patch.object(main.password_hasher, "hash", busy):
+        with pytest.raises(HTTPException) as error:
+            await main.signup(UserSignup(username="ada", email="ada@example.com", password="correct horse"))
+
+    assert error.value.status_code == 503
+    users.insert_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_cost(hasher):
+    import main
+    from schemas.user_schema import UserLogin
+    stored = _hash_password("correct horse", 5)
+    users = Mock(find_one=AsyncMock(return_value={"_id": 1, "username": "ada", "password": stored}),
+                 update_one=AsyncMock())
+    with patch("main.users_collection", users), patch("main.password_hasher", hasher), \
+            patch("main.create_jwt", return_value="token"):
+        response = await main.login(UserLogin(username="ada", password="correct horse"))
+
+    assert response["token"] == "token"
+    query, update = users.update_one.call_args.args
+    assert query == {"_id": 1}
+    assert hash_rounds(update["$set"]["password"]) == 4
+    assert await hasher.verify("correct horse", update["$set"]["password"])
+
+@pytest.mark.asyncio
+async def test_workers_are_spawned_at_start():
+    hasher = PasswordHasher(rounds=4, max_workers=2)
+    try:
+        await hasher.start()
+        assert hasher._executor._mp_context.get_start_method() == "spawn"
+        assert len(hasher._executor._processes) == 2
+        assert await hasher.verify("correct horse", await hasher.hash("correct horse"))
+    finally:
+        hasher.shutdown()
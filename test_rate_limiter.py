@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import TokenBucket, SQLiteBucketState
+
+
+@pytest.mark.asyncio
+async def test_wait_sleeps_until_next_token():
+    bucket = TokenBucket(tokens_per_second=20, max_tokens=1)
+    await bucket.wait()
+    start = time.monotonic()
+    await bucket.wait()
+    elapsed = time.monotonic() - start
+    assert 0.03 <= elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_waiters_served_in_fifo_order():
+    bucket = TokenBucket(tokens_per_second=50, max_tokens=1)
+    await bucket.wait()
+    order = []
+
+    async def waiter(name, tokens):
+        await bucket.wait(tokens)
+        order.append(name)
+
+    tasks = [asyncio.create_task(waiter(name, tokens)) for name, tokens in [("a", 1), ("b", 1), ("c", 1)]]
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_weighted_acquisition():
+    bucket = TokenBucket(tokens_per_second=1, max_tokens=3)
+    assert await bucket.acquire(2)
+    assert not await bucket.acquire(2)
+    assert await bucket.acquire(1)
+    with pytest.raises(ValueError):
+        await bucket.wait(4)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_state_shared_between_buckets(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    first = TokenBucket(tokens_per_second=0.01, max_tokens=2, state=SQLiteBucketState(path))
+    second = TokenBucket(tokens_per_second=0.01, max_tokens=2, state=SQLiteBucketState(path))
+    assert await first.acquire()
+    assert await second.acquire()
+    assert not await first.acquire()
+    assert not await second.acquire()
+
+def test_sqlite_state_is_safe_across_threads(tmp_path):
+    state = SQLiteBucketState(str(tmp_path / "buckets.db"))
+    # Threads share one connection, as concurrent to_thread calls do
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        waits = list(pool.map(lambda _: state.take(1, 0.001, 100), range(200)))
+    assert waits.count(0.0) == 100
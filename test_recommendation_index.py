@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import patch
+from recommendation_index import RecommendationIndex
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return FakeCursor(self.documents)
+
+def _product(i, features, subcategory="Headphones"):
+    return {
+        "_id": i,
+        "category": "Electronics",
+        "subcategory": subcategory,
+        "brand_options": [f"Brand {i}"],
+        "price_ranges": {"mid_range": {"min": i * 10}},
+        "common_features": features,
+    }
+
+@pytest.mark.asyncio
+async def test_feature_matches_come_first_in_collection_order():
+    index = RecommendationIndex(FakeCollection([
+        _product(1, ["wireless"]),
+        _product(2, ["noise cancelling"]),
+        _product(3, ["wireless", "noise cancelling"]),
+        _product(4, ["wired"]),
+    ]))
+    await index.build()
+    names = [r["name"] for r in index.lookup("Electronics", "Headphones", ["noise cancelling", "wireless"])]
+    assert names == ["Brand 1", "Brand 2", "Brand 3"]
+
+@pytest.mark.asyncio
+async def test_falls_back_to_category_without_duplicates():
+    index = RecommendationIndex(FakeCollection([
+        _product(1, ["wired"]),
+        _product(2, ["wireless"]),
+        _product(3, ["wired"]),
+        _product(4, ["foldable"], subcategory="Speakers"),
+    ]))
+    await index.build()
+    names = [r["name"] for r in index.lookup("Electronics", "Headphones", ["wireless"])]
+    assert names == ["Brand 2", "Brand 1", "Brand 3"]
+    assert index.lookup("Fashion", "Shoes", ["wireless"]) == []
+    assert index.stats()["products_indexed"] == 4
+    assert index.stats()["groups"] == 2
+
+class FakeAggregateCollection:
+    def __init__(self, facets):
+        self.facets = facets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return FakeCursor([self.facets])
+
+@pytest.mark.asyncio
+async def test_query_fallback_fills_up_without_duplicates():
+    import main
+    primary = [_product(1, ["wireless"]), _product(2, ["wireless"])]
+    fallback = [_product(i, ["wired"] if i > 2 else ["wireless"]) for i in range(1, 8)]
+    collection = FakeAggregateCollection({"primary": primary, "fallback": fallback})
+    with patch("main.product_collection", collection):
+        recommendations = await main._query_recommendations("Electronics", "Headphones", ["wireless"])
+
+    assert [r["name"] for r in recommendations] == [f"Brand {i}" for i in (1, 2, 3, 4, 5)]
+    assert len(collection.pipelines) == 1
+    assert collection.pipelines[0][0] == {"$match": {"category": "Electronics", "subcategory": "Headphones"}}
+
+@pytest.mark.asyncio
+async def test_query_skips_fallback_with_enough_feature_matches():
+    import main
+    primary = [_product(i, ["wireless"]) for i in (1, 2, 3)]
+    collection = FakeAggregateCollection({"primary": primary, "fallback": [_product(9, ["wired"])]})
+    with patch("main.product_collection", collection):
+        recommendations = await main._query_recommendations("Electronics", "Headphones", ["wireless"])
+
+    assert [r["name"] for r in recommendations] == ["Brand 1", "Brand 2", "Brand 3"]
@@ -0,0 +1,61 @@
+import pytest
+from search_index import SearchIndex, tokenize
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeCollection:
+    name = "products"
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        ids = query.get("_id", {}).get("$in")
+        matches = [dict(d) for d in self.documents if ids is None or d["_id"] in ids]
+        return FakeCursor(matches)
+
+PRODUCTS = [
+    {"_id": 1, "title": "Sony WH-1000XM4 Headphones"},
+    {"_id": 2, "title": "Bose QuietComfort Headphones"},
+    {"_id": 3, "title": "Sony Bravia Television"},
+    {"_id": 4, "title": "Nike Air Max 270"},
+]
+
+def test_tokenize():
+    assert tokenize("Sony WH-1000XM4!") == ["sony", "wh", "1000xm4"]
+
+@pytest.mark.asyncio
+async def test_all_tokens_must_match_and_rank():
+    index = SearchIndex(FakeCollection(PRODUCTS), ["title"])
+    results = await index.find("sony headphones")
+    assert [r["_id"] for r in results] == [1]
+
+    results = await index.find("SONY")
+    assert {r["_id"] for r in results} == {1, 3}
+
+@pytest.mark.asyncio
+async def test_prefix_matching_prefers_exact_terms():
+    index = SearchIndex(FakeCollection(PRODUCTS + [{"_id": 5, "title": "Head strap"}]), ["title"])
+    results = await index.find("head")
+    assert results[0]["_id"] == 5
+    assert {r["_id"] for r in results} == {1, 2, 5}
+
+@pytest.mark.asyncio
+async def test_find_page_follows_cursor():
+    index = SearchIndex(FakeCollection(PRODUCTS), ["title"])
+    first, cursor = await index.find_page("sony", limit=1)
+    second, last_cursor = await index.find_page("sony", limit=1, after=cursor)
+    assert len(first) == len(second) == 1
+    assert first[0]["_id"] != second[0]["_id"]
+    assert last_cursor is None
@@ -0,0 +1,90 @@
+import hashlib
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from starlette.requests import Request
+from upload_ingest import read_upload_form
+from schemas.jobs import submit_video_job
+
+BOUNDARY = "testboundary"
+
+def _part(name, data, filename=None):
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    return (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n").encode() + data + b"\r\n"
+
+def _body(*parts):
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+def _request(body, chunk_size=1024, content_length=True):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    received = []
+
+    async def receive():
+        chunk = chunks[len(received)]
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": len(received) < len(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    return request, received, chunks
+
+@pytest.mark.asyncio
+async def test_files_are_spooled_and_hashed_while_streaming():
+    photo = bytes(range(256)) * 40
+    request, _, _ = _request(_body(_part("title", b"Red kettle"), _part("files", photo, "kettle.jpg")))
+    fields, files = await read_upload_form(request)
+
+    assert fields == {"title": "Red kettle"}
+    assert files[0].filename == "kettle.jpg"
+    assert files[0].size == len(photo)
+    assert files[0].content_hash == hashlib.sha256(photo).hexdigest()
+    assert files[0].file.read() == photo
+
+@pytest.mark.asyncio
+async def test_extra_file_is_rejected_before_the_body_is_read():
+    body = _body(*(_part("files", b"x" * 4096, f"{i}.jpg") for i in range(8)))
+    request, received, chunks = _request(body, content_length=False)
+    with pytest.raises(HTTPException) as error:
+        await read_upload_form(request, max_files=2)
+    assert error.value.status_code == 400
+    assert len(received) < len(chunks)
+
+@pytest.mark.asyncio
+async def test_oversized_uploads_are_rejected():
+    body = _body(_part("files", b"x" * 200_000, "big.jpg"))
+    request, received, _ = _request(body)
+    with pytest.raises(HTTPException) as error:
+        await read_upload_form(request, max_files=1, max_file_bytes=100)
+    # The declared Content-Length alone is enough to refuse it
+    assert error.value.status_code == 413 and not received
+
+    request, received, chunks = _request(body, content_length=False)
+    with pytest.raises(HTTPException) as error:
+        await read_upload_form(request, max_files=1, max_file_bytes=100)
+    assert error.value.status_code == 413
+    assert len(received) < len(chunks)
+
+@pytest.mark.asyncio
+async def test_video_upload_is_moved_into_place(tmp_path):
+    video = b"\x00\x00\x00\x18ftypmp42" * 1000
+    request, _, _ = _request(_body(_part("file", video, "clip.mp4")))
+    with patch("schemas.jobs.UPLOAD_DIR", tmp_path), \
+            patch("main.video_jobs.submit", new_callable=AsyncMock, return_value="job") as submit:
+        response = await submit_video_job(request)
+
+    assert response["job_id"] == "job"
+    saved = Path(submit.call_args.args[1])
+    assert list(tmp_path.iterdir()) == [saved]
+    assert saved.read_bytes() == video
+
+@pytest.mark.asyncio
+async def test_rejected_video_upload_leaves_nothing_behind(tmp_path):
+    request, _, _ = _request(_body(_part("file", b"a" * 10, "a.mp4"), _part("file", b"b" * 10, "b.mp4")))
+    with patch("schemas.jobs.UPLOAD_DIR", tmp_path), pytest.raises(HTTPException) as error:
+        await submit_video_job(request)
+    assert error.value.status_code == 400
+    assert "images" not in error.value.detail
+    assert list(tmp_path.iterdir()) == []
@@ -2,17 +2,19 @@ import pytest
 import asyncio
 from pathlib import Path
 import os
-from unittest.mock import Mock, patch
+import numpy as np
+from unittest.mock import AsyncMock, Mock, patch
 from video_processor import VideoProcessor, TokenBucket
+from media_backend import FFmpegBackend
+from media_cache import MediaCache
 
 @pytest.fixture
 def google_api_key():
     return os.getenv('GOOGLE_API_KEY', 'test_key')
 
 @pytest.fixture
-async def processor(google_api_key):
-    with patch('os.path.exists', return_value=True):
-        return VideoProcessor(google_api_key)
+def processor(google_api_key):
+    return VideoProcessor(google_api_key)
 
 @pytest.fixture
 def sample_video_path():
@@ -26,50 +28,96 @@ async def test_token_bucket():
     assert not await bucket.acquire()
 
 @pytest.mark.asyncio
-async def test_video_download(processor):
-    with patch('video_processor.VideoProcessor._download_with_ytdl', return_value=True):
+async def test_video_download(processor, tmp_path):
+    processor.media_cache = MediaCache(tmp_path)
+
+    def fake_download(ydl_opts, url):
+        Path(ydl_opts['outtmpl']).write_bytes(b"video")
+        return True
+
+    with patch('video_processor.VideoProcessor._extract_info', return_value={'formats': []}), \
+         patch('video_processor.VideoProcessor._download_with_ytdl', side_effect=fake_download) as download:
         result = await processor.download_video("https://example.com/video")
         assert result is not None
         assert isinstance(result, Path)
+        # A second request for the same URL is served from the cache
+        assert await processor.download_video("https://example.com/video") == result
+        assert download.call_count == 1
 
 @pytest.mark.asyncio
 async def test_audio_extraction(processor, sample_video_path):
-    with patch('librosa.load', return_value=(Mock(), 16000)):
+    pcm = np.linspace(-1, 1, 16000, dtype=np.float32)
+    ffmpeg = Mock(returncode=0, communicate=AsyncMock(return_value=(pcm.tobytes(), b"")))
+    processor.audio_backend = FFmpegBackend("ffmpeg")
+    with patch('os.path.exists', return_value=True), \
+         patch('asyncio.create_subprocess_exec', new_callable=AsyncMock, return_value=ffmpeg) as mock_exec:
         waveform, sr = await processor._extract_audio(sample_video_path)
         assert waveform is not None
         assert sr == 16000
+        np.testing.assert_array_equal(waveform, pcm)
+        command = mock_exec.call_args.args
+        assert command[-3:] == ('-f', 'f32le', 'pipe:1')
+
+@pytest.mark.asyncio
+async def test_streamed_audio_windows_match_whole_waveform(processor):
+    processor.TRANSCRIBE_WINDOW_SECONDS, processor.TRANSCRIBE_OVERLAP_SECONDS = 2, 1
+    processor.SAMPLE_RATE, processor.TRANSCRIBE_BATCH_SIZE = 10, 2
+    waveform = np.arange(137, dtype=np.float32)
+
+    async def chunks(size):
+        for start in range(0, len(waveform), size):
+            yield waveform[start:start + size]
+
+    async def collect(source):
+        return [(bounds, [list(c) for c in windows], final)
+                async for bounds, windows, final in processor._window_batches(source)]
+
+    whole = await collect(chunks(len(waveform)))
+    assert await collect(chunks(7)) == whole
+    assert [b for batch, _, _ in whole for b in batch] == processor._transcription_windows(len(waveform))
 
 @pytest.mark.asyncio
 async def test_frame_extraction(processor, sample_video_path):
-    mock_frame = Mock()
+    mock_frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
     with patch('cv2.VideoCapture') as mock_cap:
-        mock_cap.return_value.read.return_value = (True, mock_frame)
+        mock_cap.return_value.grab.return_value = True
+        mock_cap.return_value.retrieve.return_value = (True, mock_frame)
         mock_cap.return_value.get.return_value = 100
         
         frames = await processor._extract_frames(sample_video_path, num_frames=3)
         assert len(frames) == 3
+        assert max(frames[0].size) == processor.FRAME_MAX_SIDE
+        mock_cap.return_value.set.assert_not_called()
+        assert mock_cap.return_value.retrieve.call_count == 3
 
 @pytest.mark.asyncio
 async def test_frame_analysis(processor):
     mock_frame = Mock()
-    with patch('google.generativeai.GenerativeModel.generate_content') as mock_generate:
+    with patch('google.generativeai.GenerativeModel.generate_content_async', new_callable=AsyncMock) as mock_generate:
         mock_generate.return_value.text = "Test description"
         description = await processor._analyze_frame(mock_frame)
         assert description == "Test description"
 
 @pytest.mark.asyncio
 async def test_process_video(processor):
+    async def slow(result):
+        await asyncio.sleep(0.1)
+        return result
+
     with patch.multiple(processor,
-        download_video=Mock(return_value=Path("test.mp4")),
-        _extract_audio=Mock(return_value=(Mock(), 16000)),
-        _transcribe_audio=Mock(return_value="Test transcription"),
-        _extract_frames=Mock(return_value=[Mock()]),
-        _analyze_frames=Mock(return_value=["Frame description"]),
-        _generate_description=Mock(return_value="Final description")):
+        download_video=AsyncMock(return_value=Path("test.mp4")),
+        _extract_audio=AsyncMock(return_value=(Mock(), 16000)),
+        _transcribe_audio=Mock(side_effect=lambda waveform: slow("Test transcription")),
+        _extract_frames=AsyncMock(return_value=[Mock()]),
+        _analyze_frames=Mock(side_effect=lambda frames: slow(["Frame description"])),
+        _generate_description=AsyncMock(return_value="Final description")):
         
         result = await processor.process_video("https://example.com/video")
         assert result['status'] == 'success'
         assert 'final_description' in result
+        assert result['audio_transcription'] == "Test transcription"
+        # Audio and visual branches overlap, so the total is not the sum of both
+        assert result['stage_timings']['total'] < 0.19
 
 @pytest.mark.asyncio
 async def test_error_handling(processor):
@@ -79,6 +127,44 @@ async def test_error_handling(processor):
         assert 'message' in result
 
 def test_initialization_error():
-    with patch('os.path.exists', return_value=False):
+    with patch('media_backend.frame_backend', return_value=None):
         with pytest.raises(RuntimeError):
             VideoProcessor("test_key")
+
+@pytest.mark.asyncio
+async def test_frames_analyzed_concurrently(processor):
+    in_flight = 0
+    peak = 0
+
+    async def fake_generate(*args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return Mock(text="Frame description")
+
+    with patch('google.generativeai.GenerativeModel.generate_content_async', side_effect=fake_generate):
+        descriptions = await processor._analyze_frames([Mock(), Mock(), Mock()])
+    assert descriptions == ["Frame description"] * 3
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_silent_video_does_not_load_speech_model(processor):
+    async def no_audio():
+        return
+        yield
+
+    with patch('video_processor.model_registry.aget', new_callable=AsyncMock) as load:
+        transcripts = [t async for t in processor.stream_transcription(no_audio())]
+    assert transcripts == []
+    load.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_streamed_audio_failure_is_logged(caplog):
+    import sys
+    failing = [sys.executable, "-c", "import sys; sys.stderr.write('Invalid data found'); sys.exit(1)"]
+    with patch.object(FFmpegBackend, 'audio_command', return_value=failing):
+        chunks = [c async for c in FFmpegBackend("ffmpeg").stream_audio("clip.mp4", 16000, 1600)]
+    assert chunks == []
+    assert "Invalid data found" in caplog.text
@@ -2,6 +2,7 @@ import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import logging
+from model_client import get_model_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,7 +20,7 @@ class TextProcessor:
                 raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-pro-latest")
+        self.model = get_model_client("gemini-1.5-pro-latest")
     
     async def analyze_text(self, text: str):
         """Analyze product description text and return structured data"""
@@ -44,7 +45,7 @@ END_ANALYSIS
 
 Text to analyze: {text}"""
             
-            response = self.model.generate_content(analysis_prompt)
+            response = await self.model.generate_content(analysis_prompt)
             analysis_dict = self._parse_analysis(response.text)
             analysis_dict['status'] = 'success'
             
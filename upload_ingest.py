@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import logging
+import os
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from fastapi import HTTPException, Request
+from starlette.datastructures import Headers, UploadFile
+from dotenv import load_dotenv
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # older python-multipart releases ship the `multipart` package
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Upload limits, enforced while the body is still streaming in
+MAX_UPLOAD_FILES = int(os.getenv("UPLOAD_MAX_FILES", "5"))
+MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+MAX_FIELD_BYTES = int(os.getenv("UPLOAD_MAX_FIELD_BYTES", str(64 * 1024)))
+# Each file stays in memory up to this size, then spills to a temporary file on disk
+SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(256 * 1024)))
+# Errors for requests with more files than allowed; {max_files} is filled in
+TOO_MANY_FILES = "Max {max_files} file(s) are allowed. Please remove extra files and try again."
+TOO_MANY_IMAGES = "Max {max_files} images are allowed. Please remove extra files and try again."
+
+
+class HashedUploadFile(UploadFile):
+    """UploadFile whose sha256 was computed while it was received"""
+
+    def __init__(self, file, *, filename=None, headers=None):
+        super().__init__(file, size=0, filename=filename, headers=headers)
+        self._hasher = hashlib.sha256()
+        self.content_hash = None
+
+
+class _Part:
+    def __init__(self):
+        self.headers = []
+        self.disposition = b""
+        self.name = None
+        self.file = None
+        self.data = bytearray()
+
+
+class _StreamingForm:
+    def __init__(self, max_files, max_file_bytes, file_fields, too_many_files, spool_dir):
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.file_fields = file_fields
+        self.too_many_files = too_many_files
+        self.spool_dir = spool_dir
+        self.fields = {}
+        self.files = []
+        self.pending_writes = []
+        self._part = None
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_part_begin(self):
+        self._part = _Part()
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        name = self._header_name.lower()
+        if name == b"content-disposition":
+            self._part.disposition = self._header_value
+        self._part.headers.append((name, self._header_value))
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._part.disposition)
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail='Multipart part is missing its "name"')
+        self._part.name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            return
+
+        if self._part.name not in self.file_fields:
+            raise HTTPException(status_code=400, detail=f"Unexpected file field '{self._part.name}'")
+        # Reject as soon as the extra file's headers arrive, not after the whole body
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=400, detail=self.too_many_files.format(max_files=self.max_files))
+        if self.spool_dir is not None:
+            # Written straight to a named file, so the caller can move it into place instead of copying
+            spool = NamedTemporaryFile(dir=self.spool_dir, suffix=".part", delete=False)
+        else:
+            spool = SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        self._part.file = HashedUploadFile(
+            spool,
+            filename=options[b"filename"].decode("utf-8", errors="replace"),
+            headers=Headers(raw=self._part.headers),
+        )
+        self.files.append(self._part.file)
+
+    def on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        upload = self._part.file
+        if upload is None:
+            if len(self._part.data) + len(chunk) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Field '{self._part.name}' is too large")
+            self._part.data.extend(chunk)
+            return
+
+        upload.size += len(chunk)
+        if upload.size > self.max_file_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{upload.filename} exceeds the {self.max_file_bytes // (1024 * 1024)}MB file size limit"
+            )
+        upload._hasher.update(chunk)
+        self.pending_writes.append((upload, chunk))
+
+    def on_part_end(self):
+        if self._part.file is None:
+            self.fields[self._part.name] = self._part.data.decode("utf-8", errors="replace")
+        else:
+            self._part.file.content_hash = self._part.file._hasher.hexdigest()
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+
+async def _flush(writes):
+    for upload, chunk in writes:
+        spool = upload.file
+        if getattr(spool, "_rolled", True):
+            # Writes to disk are real file I/O, so keep them off the event loop
+            await asyncio.to_thread(spool.write, chunk)
+        else:
+            spool.write(chunk)
+
+
+async def read_upload_form(request: Request, file_fields=("files",), max_files=MAX_UPLOAD_FILES,
+                           max_file_bytes=MAX_FILE_BYTES, too_many_files=TOO_MANY_FILES, spool_dir=None):
+    """
+    Stream a multipart body into bounded spooled files, enforcing limits as it arrives
+    :param file_fields: Form field names that may carry files
+    :param max_files: Maximum number of files in the request
+    :param max_file_bytes: Maximum size of each file
+    :param too_many_files: Error message for extra files; may use {max_files}
+    :param spool_dir: Write files to named temporary files in this directory instead of spooling in memory
+    :return: (dict of text fields, list of HashedUploadFile rewound to the start)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload")
+
+    # Refuse obviously oversized bodies before reading a single byte
+    max_body_bytes = max_files * max_file_bytes + 64 * 1024 + len(file_fields) * MAX_FIELD_BYTES
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_body_bytes:
+        raise HTTPException(status_code=413, detail="Upload is too large")
+
+    form = _StreamingForm(max_files, max_file_bytes, set(file_fields), too_many_files, spool_dir)
+    parser = MultipartParser(params[b"boundary"], form.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body_bytes:
+                raise HTTPException(status_code=413, detail="Upload is too large")
+            parser.write(chunk)
+            await _flush(form.pending_writes)
+            form.pending_writes.clear()
+        parser.finalize()
+    except BaseException:
+        for upload in form.files:
+            upload.file.close()
+            if spool_dir is not None:
+                os.unlink(upload.file.name)
+        raise
+
+    for upload in form.files:
+        upload.file.seek(0)
+    logger.info(f"Received {len(form.files)} file(s), {received} bytes")
+    return form.fields, form.files
+
+
+def require_field(fields, name):
+    value = fields.get(name)
+    if value is None:
+        raise HTTPException(status_code=422, detail=f"Form field '{name}' is required")
+    return value
+
+
+def multipart_openapi(file_field, many=False, required_fields=(), optional_fields=(), file_required=True):
+    """openapi_extra describing a form that is parsed by read_upload_form instead of FastAPI"""
+    file_schema = {"type": "string", "format": "binary"}
+    properties = {file_field: {"type": "array", "items": file_schema} if many else file_schema}
+    properties.update({name: {"type": "string"} for name in (*required_fields, *optional_fields)})
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": properties,
+                        "required": [file_field, *required_fields] if file_required else list(required_fields),
+                    }
+                }
+            },
+        }
+    }
@@ -1,14 +1,6 @@
-import cv2
 import numpy as np
-import torch
-from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
 import google.generativeai as genai
-import librosa
-from PIL import Image
 import os
-from tqdm import tqdm
-import subprocess
-import soundfile as sf
 from pathlib import Path
 import asyncio
 import logging
@@ -16,6 +8,13 @@ import time
 import yt_dlp as youtube_dl
 import backoff
 from functools import wraps
+from model_client import get_model_client
+from model_registry import model_registry
+from keyframes import select_keyframes
+from rate_limiter import TokenBucket, bucket_state_from_env
+import media_backend
+from media_cache import MediaCache
+from fetch_plan import PLAN_VARIANT, plan_fetch, stream_urls
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -36,79 +35,97 @@ def handle_rate_limit(max_tries=5, initial_wait=5):
         return wrapper
     return decorator
 
-class TokenBucket:
-    def __init__(self, tokens_per_second=0.05, max_tokens=10):
-        self.tokens_per_second = tokens_per_second
-        self.max_tokens = max_tokens
-        self.tokens = max_tokens
-        self.last_update = time.time()
-        self.lock = asyncio.Lock()
-        self.waiting = False
-    
-    async def acquire(self):
-        async with self.lock:
-            now = time.time()
-            time_passed = now - self.last_update
-            self.tokens = min(self.max_tokens, self.tokens + time_passed * self.tokens_per_second)
-            self.last_update = now
-            
-            if self.tokens >= 1:
-                self.tokens -= 1
-                return True
-            return False
-    
-    async def wait(self):
-        while not await self.acquire():
-            self.waiting = True
-            await asyncio.sleep(20)
-        self.waiting = False
+def _is_remote(source):
+    return str(source).startswith(("http://", "https://"))
 
 class VideoProcessor:
     def __init__(self, google_api_key):
         self.api_key = google_api_key
-        self.rate_limiter = TokenBucket(tokens_per_second=0.05)
+        self.rate_limiter = TokenBucket(tokens_per_second=0.05, state=bucket_state_from_env())
         
         genai.configure(api_key=google_api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        
-        self.ffmpeg_path = r"C:/ProgramData/chocolatey/lib/ffmpeg/tools/ffmpeg/bin/ffmpeg.exe"
-        if not os.path.exists(self.ffmpeg_path):
-            raise RuntimeError(f"FFmpeg not found at: {self.ffmpeg_path}")
+        self.model = get_model_client('gemini-1.5-pro-latest')
         
-        self.audio_processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        self.audio_model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
+        # Decoders are discovered at runtime (FFMPEG_PATH, PATH, imageio-ffmpeg, OpenCV, PyAV)
+        self.frame_backend = media_backend.frame_backend()
+        if self.frame_backend is None:
+            raise RuntimeError(f"No video decoding backend available (tried {media_backend.FRAME_BACKENDS})")
+        self.audio_backend = media_backend.audio_backend()
+        self.ffmpeg_path = media_backend.resolve_ffmpeg()
+        if self.audio_backend is None:
+            logger.warning(f"No audio decoding backend available (tried {media_backend.AUDIO_BACKENDS}), "
+                           f"videos will be processed without transcription")
+        logger.info(f"Media backends: frames={self.frame_backend.name} {self.frame_backend.capabilities()}, "
+                    f"audio={self.audio_backend.name if self.audio_backend else None} "
+                    f"{self.audio_backend.capabilities() if self.audio_backend else {}}")
         
         self.temp_dir = Path("temp")
         self.temp_dir.mkdir(exist_ok=True)
+
+        # Downloads are cached by URL and fetch settings; stream-only mode decodes straight from the remote URL
+        self.media_cache = MediaCache(variant=PLAN_VARIANT)
+        self.STREAM_ONLY = os.getenv("VIDEO_STREAM_ONLY", "false").lower() == "true"
         
         self.MAX_FRAMES_PER_VIDEO = 3
-        self.MAX_API_RETRIES = 3
-        self.API_RETRY_DELAY = 10
-        self.FRAME_ANALYSIS_DELAY = 5
+        self.FRAME_MAX_SIDE = 768
+        self.KEYFRAME_CANDIDATES = 24
+
+        # Streaming transcription: overlapping windows batched through Wav2Vec2
+        self.SAMPLE_RATE = 16000
+        self.TRANSCRIBE_WINDOW_SECONDS = 20
+        self.TRANSCRIBE_OVERLAP_SECONDS = 2
+        self.TRANSCRIBE_BATCH_SIZE = 4
+        self.TRANSCRIBE_THREADS = int(os.getenv("TRANSCRIBE_THREADS", "0"))
+        self.STREAM_AUDIO = os.getenv("TRANSCRIBE_STREAM_AUDIO", "true").lower() == "true"
+
+    @property
+    def audio_processor(self):
+        # Wav2Vec2 is loaded on first use and shared by every instance in the process
+        return model_registry.get("wav2vec2_processor")
+
+    @property
+    def audio_model(self):
+        return model_registry.get("wav2vec2_model")
 
     async def download_video(self, video_url):
+        """Return a local copy of the video, downloading it only if it is not cached"""
         try:
-            temp_path = self.temp_dir / f"{abs(hash(video_url))}.mp4"
-            ydl_opts = {
-                'format': 'best',
-                'outtmpl': str(temp_path),
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': True
-            }
-            
-            loop = asyncio.get_event_loop()
-            success = await loop.run_in_executor(None, 
-                lambda: self._download_with_ytdl(ydl_opts, video_url))
-            
-            if success and temp_path.exists():
-                return temp_path
-            return None
-            
+            return await self.media_cache.fetch(video_url, self._fetch_to)
         except Exception as e:
             logger.error(f"Error downloading video: {str(e)}")
             return None
 
+    def _extract_info(self, video_url):
+        with youtube_dl.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            return ydl.extract_info(video_url, download=False)
+
+    async def _fetch_to(self, video_url, destination):
+        # Fetch only the streams frame analysis and 16 kHz transcription actually need
+        try:
+            info = await asyncio.to_thread(self._extract_info, video_url)
+            plan = plan_fetch(info, ffmpeg_path=self.ffmpeg_path)
+        except Exception as e:
+            logger.warning(f"Could not plan fetch for {video_url}, downloading best format: {str(e)}")
+            plan = {'format': 'best'}
+
+        ydl_opts = {
+            **plan,
+            'outtmpl': str(destination),
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': True
+        }
+        return await asyncio.to_thread(self._download_with_ytdl, ydl_opts, video_url)
+
+    async def resolve_stream(self, video_url):
+        """Resolve a page URL to direct (video, audio) media URLs that the decoders read without a download"""
+        try:
+            info = await asyncio.to_thread(self._extract_info, video_url)
+            return stream_urls(info)
+        except Exception as e:
+            logger.error(f"Error resolving video stream: {str(e)}")
+            return None, None
+
     def _download_with_ytdl(self, ydl_opts, url):
         with youtube_dl.YoutubeDL(ydl_opts) as ydl:
             try:
@@ -120,72 +137,145 @@ class VideoProcessor:
 
     async def _extract_audio(self, video_path):
         try:
-            if not os.path.exists(str(video_path)):
+            if not _is_remote(video_path) and not os.path.exists(str(video_path)):
                 raise FileNotFoundError(f"Video file not found: {video_path}")
-                
-            temp_audio_path = self.temp_dir / "temp_audio.wav"
-            command = [
-                str(self.ffmpeg_path),
-                '-i', str(video_path),
-                '-ab', '160k',
-                '-ac', '2',
-                '-ar', '16000',
-                '-vn', str(temp_audio_path),
-                '-y'
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
-            
-            if not os.path.exists(str(temp_audio_path)):
+            if self.audio_backend is None:
+                return None, None
+
+            waveform = await self.audio_backend.decode_audio(video_path, self.SAMPLE_RATE)
+            if waveform is None:
                 return None, None
-                
-            waveform, sample_rate = librosa.load(str(temp_audio_path), sr=16000)
-            os.remove(str(temp_audio_path))
-            return waveform, sample_rate
-            
+            return waveform, self.SAMPLE_RATE
+
         except Exception as e:
             logger.error(f"Error extracting audio: {str(e)}")
             return None, None
 
-    async def _transcribe_audio(self, waveform):
+    async def stream_audio(self, video_path, chunk_seconds=None):
+        """Yield mono float32 chunks of the soundtrack while it is still being decoded"""
+        if self.audio_backend is None:
+            return
+        chunk_samples = int((chunk_seconds or self.TRANSCRIBE_WINDOW_SECONDS) * self.SAMPLE_RATE)
+        async for chunk in self.audio_backend.stream_audio(video_path, self.SAMPLE_RATE, chunk_samples):
+            yield chunk
+
+    def _transcription_windows(self, num_samples):
+        """Split the waveform into overlapping (start, end) sample windows"""
+        window = self.TRANSCRIBE_WINDOW_SECONDS * self.SAMPLE_RATE
+        step = window - self.TRANSCRIBE_OVERLAP_SECONDS * self.SAMPLE_RATE
+        windows = []
+        start = 0
+        while True:
+            end = min(start + window, num_samples)
+            windows.append((start, end))
+            if end >= num_samples:
+                return windows
+            start += step
+
+    def _transcribe_batch(self, chunks):
+        """Run a batch of audio windows through Wav2Vec2 and return per-window token ids"""
+        import torch
+        if self.TRANSCRIBE_THREADS and torch.get_num_threads() != self.TRANSCRIBE_THREADS:
+            torch.set_num_threads(self.TRANSCRIBE_THREADS)
+
+        inputs = self.audio_processor(chunks, sampling_rate=self.SAMPLE_RATE, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            logits = self.audio_model(inputs.input_values).logits
+        predicted_ids = torch.argmax(logits, dim=-1)
+
+        # Drop the frames that only exist because shorter windows were padded
+        lengths = self.audio_model._get_feat_extract_output_lengths(
+            torch.tensor([len(chunk) for chunk in chunks]))
+        return [ids[:int(length)] for ids, length in zip(predicted_ids, lengths)]
+
+    async def _window_batches(self, chunks):
+        """
+        Cut an async stream of audio chunks into batches of overlapping windows
+        :return: Async iterator of ((start, end) bounds, window arrays, whether this is the final batch)
+        """
+        window = self.TRANSCRIBE_WINDOW_SECONDS * self.SAMPLE_RATE
+        step = window - self.TRANSCRIBE_OVERLAP_SECONDS * self.SAMPLE_RATE
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0  # Sample index of buffer[0] within the whole soundtrack
+        start = 0
+        pending = []
+
+        async for chunk in chunks:
+            buffer = np.concatenate([buffer, chunk]) if len(buffer) else chunk
+            # A full window ending before the audio received so far cannot be the last one
+            while start + window < offset + len(buffer):
+                pending.append((start, start + window))
+                start += step
+            while len(pending) >= self.TRANSCRIBE_BATCH_SIZE:
+                batch, pending = pending[:self.TRANSCRIBE_BATCH_SIZE], pending[self.TRANSCRIBE_BATCH_SIZE:]
+                yield batch, [buffer[s - offset:e - offset] for s, e in batch], False
+                # Release audio that no remaining window needs
+                keep_from = pending[0][0] if pending else start
+                buffer = buffer[keep_from - offset:]
+                offset = keep_from
+
+        total = offset + len(buffer)
+        if total == 0:
+            return
+        pending.extend((s + start, e + start) for s, e in self._transcription_windows(total - start))
+        for batch_start in range(0, len(pending), self.TRANSCRIBE_BATCH_SIZE):
+            batch = pending[batch_start:batch_start + self.TRANSCRIBE_BATCH_SIZE]
+            final = batch_start + self.TRANSCRIBE_BATCH_SIZE >= len(pending)
+            yield batch, [buffer[s - offset:e - offset] for s, e in batch], final
+
+    async def stream_transcription(self, audio):
+        """
+        Yield the transcript so far after each batch of windows is decoded
+        :param audio: A whole waveform, or an async iterator of chunks such as stream_audio()
+        """
+        if not hasattr(audio, "__aiter__"):
+            waveform = audio
+
+            async def single_chunk():
+                yield np.asarray(waveform, dtype=np.float32)
+            audio = single_chunk()
+
+        # Each window keeps the half of every overlap nearest to its own centre
+        half_overlap = self.TRANSCRIBE_OVERLAP_SECONDS * self.SAMPLE_RATE // 2
+        loop = asyncio.get_running_loop()
+        kept_ids = []
+        models_loaded = False
+
+        async for bounds, chunks, final in self._window_batches(audio):
+            if not models_loaded:
+                # Loaded with the first audio, so videos without a soundtrack never load torch
+                import torch
+                await model_registry.aget("wav2vec2_processor")
+                await model_registry.aget("wav2vec2_model")
+                models_loaded = True
+            batch_ids = await loop.run_in_executor(None, self._transcribe_batch, chunks)
+
+            for position, ((start, end), ids) in enumerate(zip(bounds, batch_ids)):
+                overlap_frames = round(half_overlap * len(ids) / (end - start))
+                keep_start = overlap_frames if kept_ids else 0
+                is_last = final and position == len(bounds) - 1
+                keep_end = len(ids) if is_last else len(ids) - overlap_frames
+                kept_ids.append(ids[keep_start:keep_end])
+
+            # CTC collapsing runs over the stitched ids, so words spanning windows decode once
+            yield self.audio_processor.decode(torch.cat(kept_ids))
+
+    async def _transcribe_audio(self, audio):
         try:
-            inputs = self.audio_processor(waveform, sampling_rate=16000, return_tensors="pt", padding=True)
-            with torch.no_grad():
-                logits = self.audio_model(inputs.input_values).logits
-            predicted_ids = torch.argmax(logits, dim=-1)
-            return self.audio_processor.batch_decode(predicted_ids)[0]
+            transcription = ""
+            async for transcription in self.stream_transcription(audio):
+                pass
+            return transcription
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             return ""
 
     async def _extract_frames(self, video_path, num_frames=5):
-        frames = []
         try:
-            cap = cv2.VideoCapture(str(video_path))
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames > 0:
-                frame_indices = np.linspace(0, total_frames-1, num_frames, dtype=int)
-                for idx in frame_indices:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                    ret, frame = cap.read()
-                    if ret:
-                        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        frames.append(Image.fromarray(frame))
-                        
+            return await asyncio.to_thread(self.frame_backend.sample_frames, video_path, num_frames, self.FRAME_MAX_SIDE)
         except Exception as e:
             logger.error(f"Error extracting frames: {str(e)}")
-            
-        finally:
-            if 'cap' in locals():
-                cap.release()
-                
-        return frames
+            return []
 
     @handle_rate_limit(max_tries=3, initial_wait=2)
     async def _analyze_frame(self, frame):
@@ -197,34 +287,25 @@ Include:
 3. Potential uses
 4. Any visible technical specifications
 Keep the description professional and engaging."""
-        response = self.model.generate_content([prompt, frame])
+        response = await self.model.generate_content([prompt, frame])
         return response.text
 
     async def _analyze_frames(self, frames):
-        descriptions = []
         frames = frames[:self.MAX_FRAMES_PER_VIDEO]
-        
-        for frame in tqdm(frames, desc="Analyzing frames"):
-            try:
-                for attempt in range(self.MAX_API_RETRIES):
-                    try:
-                        await self.rate_limiter.wait()
-                        description = await self._analyze_frame(frame)
-                        if description:
-                            descriptions.append(description)
-                            break
-                        await asyncio.sleep(2)
-                    except Exception as e:
-                        if "429" in str(e):
-                            await asyncio.sleep(self.API_RETRY_DELAY * (attempt + 1))
-                            continue
-                        raise e
-                        
-            except Exception as e:
-                logger.error(f"Error analyzing frame: {str(e)}")
-                
-            await asyncio.sleep(self.FRAME_ANALYSIS_DELAY)
-        
+
+        # All frames are in flight at once; the token bucket is the only throttle
+        # and 429s are retried with backoff by _analyze_frame itself
+        results = await asyncio.gather(
+            *(self._analyze_frame(frame) for frame in frames),
+            return_exceptions=True
+        )
+
+        descriptions = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error analyzing frame: {str(result)}")
+            elif result:
+                descriptions.append(result)
         return descriptions
 
     @handle_rate_limit(max_tries=3, initial_wait=2)
@@ -246,36 +327,94 @@ Please provide a well-structured description that includes:
 4. Recommended uses
 5. Notable information from the audio narration"""
         
-        response = self.model.generate_content(prompt)
+        response = await self.model.generate_content(prompt)
         return response.text
 
     async def process_video(self, video_url):
         try:
+            if self.STREAM_ONLY:
+                stream_url, audio_url = await self.resolve_stream(video_url)
+                if not stream_url:
+                    return {'status': 'error', 'message': 'Failed to resolve video stream'}
+                return await self.process_local_video(stream_url, keep_file=True, audio_source=audio_url)
+
             video_path = await self.download_video(video_url)
             if not video_path:
                 return {'status': 'error', 'message': 'Failed to download video'}
-            
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
+        try:
+            # Cached downloads are kept so re-analysis does not fetch the video again
+            return await self.process_local_video(video_path, keep_file=True)
+        finally:
+            self.media_cache.release(video_path)
+
+    async def process_local_video(self, video_path, keep_file=False, audio_source=None):
+        """
+        Analyze a video file on disk (or a direct media URL)
+        :param keep_file: Leave the file in place instead of removing it afterwards
+        :param audio_source: Separate file or URL for the soundtrack, if not muxed into video_path
+        """
+        audio_source = audio_source or video_path
+        stage_timings = {}
+
+        async def timed(stage, awaitable):
+            start = time.perf_counter()
+            try:
+                return await awaitable
+            finally:
+                stage_timings[stage] = round(time.perf_counter() - start, 3)
+
+        # Audio branch: ffmpeg decode, then Wav2Vec2 (CPU, in the executor)
+        async def audio_branch():
+            if self.STREAM_AUDIO:
+                # Windows are transcribed while ffmpeg is still decoding later audio
+                return await timed('transcribe_audio', self._transcribe_audio(self.stream_audio(audio_source)))
+            waveform, sr = await timed('extract_audio', self._extract_audio(audio_source))
+            if waveform is None:
+                return ""
+            return await timed('transcribe_audio', self._transcribe_audio(waveform))
+
+        # Visual branch: frame decode and keyframe selection (CPU, threads), then Gemini (network)
+        async def visual_branch():
+            frames = await timed('extract_frames', self._extract_frames(video_path, num_frames=self.KEYFRAME_CANDIDATES))
+            if not frames:
+                return None
+            # Send only the most distinct shots to Gemini
+            frames = await timed('select_keyframes', asyncio.to_thread(select_keyframes, frames, self.MAX_FRAMES_PER_VIDEO))
+            return await timed('analyze_frames', self._analyze_frames(frames))
+
+        try:
+            start = time.perf_counter()
+            audio_task = asyncio.create_task(audio_branch())
             try:
-                waveform, sr = await self._extract_audio(video_path)
-                audio_transcription = await self._transcribe_audio(waveform) if waveform is not None else ""
-                
-                frames = await self._extract_frames(video_path)
-                if not frames:
+                # The branches are independent, so latency is that of the slower one
+                frame_descriptions = await visual_branch()
+                if frame_descriptions is None:
                     return {'status': 'error', 'message': 'Failed to extract frames from video'}
-                
-                frame_descriptions = await self._analyze_frames(frames)
-                final_description = await self._generate_description(frame_descriptions, audio_transcription)
-                
-                return {
-                    'status': 'success',
-                    'frame_descriptions': frame_descriptions,
-                    'audio_transcription': audio_transcription,
-                    'final_description': final_description
-                }
-                
+                audio_transcription = await audio_task
             finally:
-                if os.path.exists(str(video_path)):
-                    os.remove(str(video_path))
-                    
+                if not audio_task.done():
+                    audio_task.cancel()
+                    await asyncio.gather(audio_task, return_exceptions=True)
+
+            final_description = await timed('generate_description',
+                                            self._generate_description(frame_descriptions, audio_transcription))
+            stage_timings['total'] = round(time.perf_counter() - start, 3)
+            logger.info(f"Processed {video_path} in {stage_timings['total']}s: {stage_timings}")
+
+            return {
+                'status': 'success',
+                'frame_descriptions': frame_descriptions,
+                'audio_transcription': audio_transcription,
+                'final_description': final_description,
+                'stage_timings': stage_timings
+            }
+
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
+
+        finally:
+            if not keep_file and os.path.exists(str(video_path)):
+                os.remove(str(video_path))